@@ -1,13 +1,41 @@
 import streamlit as st
 import pandas as pd
-from bson.objectid import ObjectId
-from utils import db
+from admin_utils import (
+    access_col, approved_students, course_col, load_admin_data, move_students,
+    not_access_col, reg_col, registration_ids, registration_usernames, search_filter, set_course_status,
+    update_registration,
+)
+from log_writer import log_writer
+
+
+def pager_state(key, query):
+    """Cursor stack of one paginated list; starts over when its query changes."""
+    state = st.session_state.get(f"{key}_pager")
+    if not state or state["query"] != repr(query):
+        state = st.session_state[f"{key}_pager"] = {"query": repr(query), "cursors": [None]}
+    return state
+
+
+def load_admin_page(page_queries):
+    """Loads the dashboard (see admin_utils.load_admin_data) at each list's current page."""
+    cursors = {key: pager_state(key, query)["cursors"][-1] for key, (_, query) in page_queries.items()}
+    return load_admin_data(page_queries, cursors)
+
+
+def paginated(key, page):
+    """Renders Previous/Next controls for a page loaded by load_admin_page and returns its rows."""
+    state = st.session_state[f"{key}_pager"]
+    docs, has_more = page
+    col1, col2, col3 = st.columns([1, 1, 3])
+    if col1.button("⬅ Previous", key=f"{key}_prev", disabled=len(state["cursors"]) == 1):
+        state["cursors"].pop()
+        st.rerun()
+    if col2.button("➡ Next", key=f"{key}_next", disabled=not has_more):
+        state["cursors"].append(docs[-1]["_id"])
+        st.rerun()
+    col3.caption(f"Page {len(state['cursors'])}")
+    return docs
 
-reg_col = db["student_registrations"]
-access_col = db["access_students"]
-not_access_col = db["not_access_students"]
-course_col = db["courses"]
-logs_col = db["instructor_logs"]
 
 def admin_login():
     st.markdown("""
@@ -43,100 +71,141 @@ def admin_panel():
 
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("📈 Dashboard Summary")
-    st.metric("📝 Pending Students", len(list(reg_col.find({}))))
-    st.metric("✅ Approved Students", len(list(access_col.find({}))))
-    st.metric("❌ Rejected Students", len(list(not_access_col.find({}))))
+    student_queries = {
+        key: search_filter(st.session_state.get(f"{key}_search", ""), ["username", "email"])
+        for key in ["pending", "approved", "rejected"]
+    }
+    page = load_admin_page({
+        "pending": (reg_col.name, student_queries["pending"]),
+        "approved": (access_col.name, student_queries["approved"]),
+        "rejected": (not_access_col.name, student_queries["rejected"]),
+        "pending_courses": (course_col.name, {"status": "pending"}),
+        "approved_courses": (course_col.name, {"status": "approved"}),
+        "rejected_courses": (course_col.name, {"status": "rejected"}),
+    })
+    summary = page.summary
+    st.metric("📝 Pending Students", summary["pending_students"])
+    st.metric("✅ Approved Students", summary["approved_students"])
+    st.metric("❌ Rejected Students", summary["rejected_students"])
 
     st.markdown("<hr>", unsafe_allow_html=True)
-    pending = list(reg_col.find({}))
-    if not pending:
+    if not summary["pending_students"]:
         st.info("🎉 No new registrations to approve.")
     else:
         st.markdown("### 📋 Pending Student Approvals")
+        st.text_input("🔎 Search pending by username or email prefix", key="pending_search")
+        query = student_queries["pending"]
+        pending = paginated("pending", page.pages["pending"])
+
+        labels = {user["_id"]: f"{user['username']} ({user['email']})" for user in pending}
+        selected = st.multiselect("Select registrations", list(labels), format_func=labels.get, key="pending_selected")
+        select_all = st.checkbox("Apply to every pending registration matching the search", key="pending_all")
+        col1, col2 = st.columns(2)
+        bulk_target = None
+        if col1.button("✅ Approve selected", key="bulk_approve"):
+            bulk_target = access_col
+        if col2.button("❌ Reject selected", key="bulk_reject"):
+            bulk_target = not_access_col
+        if bulk_target is not None:
+            ids = registration_ids(query) if select_all else selected
+            if not ids:
+                st.warning("⚠️ No registrations selected.")
+            else:
+                usernames = registration_usernames(ids)
+                results = move_students(ids, bulk_target)
+                st.success(f"Processed {len(results)} registrations.")
+                st.dataframe(pd.DataFrame(
+                    [{"Student": usernames.get(_id, str(_id)), "Result": result} for _id, result in results.items()]
+                ), use_container_width=True)
+
         for i, user in enumerate(pending):
-            with st.expander(f"👤 {user['name']} ({user['email']})"):
+            # Only the opened row builds its form widgets
+            if st.toggle(f"👤 {user['name']} ({user['email']})", key=f"open_{user['_id']}"):
                 name = st.text_input("Name", user["name"], key=f"name_{user['_id']}_{i}")
                 email = st.text_input("Email", user["email"], key=f"email_{user['_id']}_{i}")
                 phone = st.text_input("Phone", user["phone"], key=f"phone_{user['_id']}_{i}")
                 username = st.text_input("Username", user["username"], key=f"username_{user['_id']}_{i}")
 
                 if st.button("💾 Save Changes", key=f"save_{user['_id']}_{i}"):
-                    reg_col.update_one(
-                        {"_id": ObjectId(user["_id"])},
-                        {"$set": {
-                            "name": name,
-                            "email": email,
-                            "phone": phone,
-                            "username": username
-                        }}
-                    )
+                    update_registration(user["_id"], {
+                        "name": name,
+                        "email": email,
+                        "phone": phone,
+                        "username": username
+                    })
                     st.success("✅ Student details updated successfully.")
 
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("✅ Approve", key=f"approve_{user['_id']}_{i}"):
-                        access_col.insert_one(user)
-                        reg_col.delete_one({"_id": ObjectId(user["_id"])})
-                        st.toast(f"✅ Approved: {user['username']}")
+                        result = move_students([user["_id"]], access_col)[user["_id"]]
+                        if result.startswith("failed"):
+                            st.error(f"❌ {user['username']} was not approved: {result}")
+                        else:
+                            st.toast(f"✅ Approved: {user['username']}")
 
                 with col2:
                     if st.button("❌ Reject", key=f"reject_{user['_id']}_{i}"):
-                        not_access_col.insert_one(user)
-                        reg_col.delete_one({"_id": ObjectId(user["_id"])})
-                        st.warning(f"{user['name']} has been rejected.")
+                        result = move_students([user["_id"]], not_access_col)[user["_id"]]
+                        if result.startswith("failed"):
+                            st.error(f"❌ {user['username']} was not rejected: {result}")
+                        else:
+                            st.warning(f"{user['name']} has been rejected.")
 
     st.markdown("<hr>", unsafe_allow_html=True)
     with st.expander("✅ Approved Students"):
-        approved = list(access_col.find({}))
-        for user in approved:
+        st.text_input("🔎 Search approved by username or email prefix", key="approved_search")
+        for user in paginated("approved", page.pages["approved"]):
             st.markdown(f"- **{user['name']}** ({user['email']})")
-        if approved:
-            df = pd.DataFrame(approved)
-            df = df.drop(columns=["_id"]) if "_id" in df.columns else df
+        if summary["approved_students"] and st.button("📥 Prepare CSV export"):
+            df = pd.DataFrame(approved_students())
             st.download_button("📥 Download CSV", df.to_csv(index=False), "approved_students.csv", "text/csv")
 
     with st.expander("❌ Rejected Students"):
-        rejected = list(not_access_col.find({}))
-        for user in rejected:
+        st.text_input("🔎 Search rejected by username or email prefix", key="rejected_search")
+        for user in paginated("rejected", page.pages["rejected"]):
             st.markdown(f"- **{user['name']}** ({user['email']})")
 
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("📘 Course Management")
-    pending_courses = list(course_col.find({"status": "pending"}))
-    approved_courses = list(course_col.find({"status": "approved"}))
-    rejected_courses = list(course_col.find({"status": "rejected"}))
-
-    if pending_courses:
+    if summary["courses"].get("pending"):
         st.markdown("### ⏳ Pending Course Approvals")
+        pending_courses = paginated("pending_courses", page.pages["pending_courses"])
         for i, course in enumerate(pending_courses):
-            with st.expander(f"{course['title']} by {course['instructor']}"):
+            if st.toggle(f"{course['title']} by {course['instructor']}", key=f"open_course_{course['_id']}"):
                 st.write(course.get("description", "No description provided."))
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("✅ Approve Course", key=f"approve_course_{course['_id']}_{i}"):
-                        course_col.update_one({"_id": ObjectId(course["_id"])}, {"$set": {"status": "approved"}})
+                        set_course_status(course["_id"], "approved")
                         st.success(f"Approved course: {course['title']}")
                 with col2:
                     if st.button("❌ Reject Course", key=f"reject_course_{course['_id']}_{i}"):
-                        course_col.update_one({"_id": ObjectId(course["_id"])}, {"$set": {"status": "rejected"}})
+                        set_course_status(course["_id"], "rejected")
                         st.warning(f"Rejected course: {course['title']}")
     else:
         st.info("✅ No pending courses for approval.")
 
-    with st.expander("📗 Approved Courses"):
-        for course in approved_courses:
+    with st.expander(f"📗 Approved Courses ({summary['courses'].get('approved', 0)})"):
+        for course in paginated("approved_courses", page.pages["approved_courses"]):
             st.markdown(f"- **{course['title']}** by {course['instructor']}")
 
-    with st.expander("📕 Rejected Courses"):
-        for course in rejected_courses:
+    with st.expander(f"📕 Rejected Courses ({summary['courses'].get('rejected', 0)})"):
+        for course in paginated("rejected_courses", page.pages["rejected_courses"]):
             st.markdown(f"- **{course['title']}** by {course['instructor']}")
 
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("📜 Instructor Activity Logs")
-    logs = list(logs_col.find().sort("timestamp", -1))
-    for log in logs[:50]:
+    for log in page.logs:
         st.markdown(f"🕒 [{log['timestamp']}] **{log['username']}** - {log['action']}")
 
+    writer = log_writer.metrics()
+    st.caption(f"Log writer: {writer['written']} written in {writer['batches']} batches, "
+               f"{writer['pending']} queued (peak {writer['max_depth']}), "
+               f"{writer['dropped']} dropped, {writer['failed']} failed")
+    if writer["last_error"]:
+        st.caption(f"Last log write error: {writer['last_error']}")
+
     st.markdown("<hr>", unsafe_allow_html=True)
     if st.button("🔒 Logout", key="admin_logout"):
         st.session_state.pop("admin_logged_in", None)
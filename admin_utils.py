@@ -0,0 +1,195 @@
+import asyncio
+import re
+import time
+from typing import NamedTuple
+
+from bson.objectid import ObjectId
+from pymongo import ReadPreference
+from pymongo.errors import BulkWriteError, OperationFailure
+
+import async_db
+from token_utils import DEFAULT_TOKENS
+from utils import db, get_client
+
+reg_col = db["student_registrations"]
+access_col = db["access_students"]
+not_access_col = db["not_access_students"]
+course_col = db["courses"]
+
+SUMMARY_TTL = 10  # seconds the dashboard counters may lag behind writes
+PAGE_SIZE = 20
+MOVE_BATCH_SIZE = 500
+
+_summary_cache = {"value": None, "loaded_at": 0.0}
+
+COURSE_STATUS_PIPELINE = [{"$group": {"_id": {"$ifNull": ["$status", "unknown"]}, "count": {"$sum": 1}}}]
+
+
+async def load_dashboard_summary():
+    """
+    Returns all dashboard counters, fetched concurrently: the student totals are whole
+    collections, so they come from collection metadata (estimated_document_count) without
+    scanning; only the course totals per status need a $group. Cached for SUMMARY_TTL seconds.
+    """
+    if _summary_cache["value"] is not None and time.monotonic() - _summary_cache["loaded_at"] < SUMMARY_TTL:
+        return _summary_cache["value"]
+
+    pending, approved, rejected, courses = await asyncio.gather(
+        async_db.collection(reg_col.name).estimated_document_count(),
+        async_db.collection(access_col.name).estimated_document_count(),
+        async_db.collection(not_access_col.name).estimated_document_count(),
+        # From the primary, so an approval shows in the counters on the next rerun
+        async_db.aggregate(course_col.name, COURSE_STATUS_PIPELINE, route="primary"),
+    )
+    _summary_cache.update(loaded_at=time.monotonic(), value={
+        "pending_students": pending,
+        "approved_students": approved,
+        "rejected_students": rejected,
+        "courses": {row["_id"]: row["count"] for row in courses},
+    })
+    return _summary_cache["value"]
+
+
+def clear_dashboard_summary():
+    _summary_cache["value"] = None
+
+
+def search_filter(text, fields):
+    """Anchored prefix match on the given fields, so the lookup can use their indexes."""
+    if not text:
+        return {}
+    prefix = {"$regex": "^" + re.escape(text.strip())}
+    return {"$or": [{field: prefix} for field in fields]}
+
+
+async def fetch_page(name, query, after_id=None, page_size=PAGE_SIZE):
+    """
+    Returns (docs, has_more) for one page ordered by _id. Pages continue from the
+    last _id seen instead of skipping, so every page costs the same.
+    """
+    if after_id is not None:
+        query = {"$and": [query, {"_id": {"$gt": after_id}}]}
+    docs = await async_db.find(name, query, sort=[("_id", 1)], limit=page_size + 1, route="primary")
+    return docs[:page_size], len(docs) > page_size
+
+
+class AdminPageData(NamedTuple):
+    summary: dict
+    pages: dict  # pager key -> (docs, has_more)
+    logs: list
+
+
+def load_admin_data(page_queries, cursors):
+    """
+    Loads everything the dashboard shows in one concurrent batch: the summary counters,
+    one page of every list in page_queries ({key: (collection name, query)}), continuing
+    after cursors[key], and the latest instructor activity logs.
+    """
+    async def load():
+        return await asyncio.gather(
+            load_dashboard_summary(),
+            async_db.find("instructor_logs", {}, sort=[("timestamp", -1)], limit=50),
+            *[fetch_page(name, query, cursors[key]) for key, (name, query) in page_queries.items()],
+        )
+    summary, logs, *pages = async_db.run(load())
+    return AdminPageData(summary, dict(zip(page_queries, pages)), logs)
+
+
+def _move_batch(ids, target_col, session=None):
+    """
+    Copies registrations into target_col and deletes them from reg_col. Rows already in
+    target_col (left there by an interrupted move) are only deleted; when approving, rows
+    whose username is taken by another approved student stay pending. Only a duplicate _id
+    counts as already moved: any other duplicate key fails the row and keeps its registration.
+    Returns {_id: result}.
+    """
+    docs = list(reg_col.find({"_id": {"$in": ids}}, session=session))
+    existing = {d["_id"] for d in target_col.find({"_id": {"$in": [d["_id"] for d in docs]}}, {"_id": 1}, session=session)}
+    taken = set()
+    if target_col is access_col:  # only approved usernames are unique; a student may be rejected again
+        taken = {d["username"] for d in target_col.find(
+            {"username": {"$in": [d.get("username") for d in docs]}, "_id": {"$nin": [d["_id"] for d in docs]}},
+            {"username": 1}, session=session
+        )}
+    results = {_id: "not found" for _id in ids}
+    results.update({d["_id"]: "already moved" for d in docs if d["_id"] in existing})
+    results.update({d["_id"]: "failed: username taken" for d in docs if d.get("username") in taken})
+
+    new_docs = [d for d in docs if d["_id"] not in existing and d.get("username") not in taken]
+    if target_col is access_col:
+        for d in new_docs:
+            d.setdefault("tokens", DEFAULT_TOKENS)
+    errors = {}
+    if new_docs:
+        try:
+            target_col.insert_many(new_docs, ordered=False, session=session)
+        except BulkWriteError as e:
+            if session is not None:
+                raise
+            errors = {new_docs[error["index"]]["_id"]: error for error in e.details["writeErrors"]}
+    for d in new_docs:
+        error = errors.get(d["_id"])
+        if error is None:
+            results[d["_id"]] = "moved"
+        elif error.get("code") == 11000 and error.get("keyPattern") == {"_id": 1}:
+            results[d["_id"]] = "already moved"  # a concurrent move of the same row got there first
+        else:
+            results[d["_id"]] = f"failed: {error['errmsg']}"
+
+    moved = [_id for _id, result in results.items() if result in ("moved", "already moved")]
+    if moved:
+        reg_col.delete_many({"_id": {"$in": moved}}, session=session)
+    return results
+
+
+def move_students(ids, target_col):
+    """
+    Moves registrations to target_col (approve or reject) in batches of one insert_many and
+    one delete_many each. Each batch runs in a transaction; standalone servers, which have no
+    transactions, fall back to insert-then-delete, which a retry repairs if interrupted.
+    A batch whose transaction aborts is reported as failed and the next batch still runs.
+    Returns {_id: result} for every requested id.
+    """
+    ids = list(ids)
+    results = {}
+    for start in range(0, len(ids), MOVE_BATCH_SIZE):
+        batch = ids[start:start + MOVE_BATCH_SIZE]
+        try:
+            with get_client().start_session() as session:
+                results.update(session.with_transaction(lambda s: _move_batch(batch, target_col, s),
+                                                        read_preference=ReadPreference.PRIMARY))
+        except OperationFailure as e:
+            if e.code == 20:  # IllegalOperation: transactions need a replica set or mongos
+                results.update(_move_batch(batch, target_col))
+                continue
+            # A write error (BulkWriteError, code 65) or a conflict that outlasted the retries
+            # of with_transaction rolled the whole batch back
+            if isinstance(e, BulkWriteError) and e.details.get("writeErrors"):
+                reason = e.details["writeErrors"][0]["errmsg"]
+            else:
+                reason = str(e)
+            results.update({_id: f"failed: {reason}" for _id in batch})
+    clear_dashboard_summary()
+    return results
+
+
+def registration_ids(query):
+    return [d["_id"] for d in reg_col.find(query, {"_id": 1})]
+
+
+def registration_usernames(ids):
+    """{_id: username} of pending registrations, read before a move (failed rows never leave reg_col)."""
+    return {d["_id"]: d.get("username") for d in reg_col.find({"_id": {"$in": ids}}, {"username": 1})}
+
+
+def update_registration(registration_id, fields):
+    reg_col.update_one({"_id": ObjectId(registration_id)}, {"$set": fields})
+
+
+def approved_students():
+    return list(access_col.find({}, {"_id": 0}))
+
+
+def set_course_status(course_id, status):
+    course_col.update_one({"_id": ObjectId(course_id)}, {"$set": {"status": status}})
+    clear_dashboard_summary()
@@ -0,0 +1,211 @@
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from indexes import INDEXES
+from utils import db, read_collection
+
+# Rollups kept up to date as results are written, so analytics never scans `results`
+STUDENT_ROLLUPS = "student_rollups"  # _id: username
+SKILL_ROLLUPS = "student_skill_rollups"  # _id: {"username", "skill"}
+
+# Timeline chart limits: traces beyond TIMELINE_TOP_N are merged into "Others", and
+# traces are downsampled so the whole chart stays under TIMELINE_POINT_BUDGET points
+TIMELINE_TOP_N = 10
+TIMELINE_POINT_BUDGET = 2000
+OTHERS = "Others"
+COHORT = "All students"
+
+
+def _rollup_update(score, timestamp, fields):
+    return {
+        "$set": fields,
+        "$inc": {"count": 1, "score_sum": score},
+        "$max": {"max_score": score, "last_timestamp": timestamp},
+    }
+
+
+def record_result(result):
+    """Folds one saved result into the per-student and per-(student, skill) rollups."""
+    username = result.get("username", "unknown")
+    skill = result.get("skill") or "Unknown Skill"
+    score = result.get("score", 0)
+    timestamp = result.get("timestamp") or datetime.utcnow()
+
+    db[STUDENT_ROLLUPS].update_one(
+        {"_id": username}, _rollup_update(score, timestamp, {"username": username}), upsert=True
+    )
+    db[SKILL_ROLLUPS].update_one(
+        {"_id": {"username": username, "skill": skill}},
+        _rollup_update(score, timestamp, {"username": username, "skill": skill}),
+        upsert=True,
+    )
+
+
+# The old submit page saved a result on every rerun, so legacy attempts can have several
+# documents with the same session_id; each attempt counts once, as its first document
+_DEDUPE_ATTEMPTS = [
+    {"$sort": {"_id": 1}},
+    {"$group": {"_id": {"$ifNull": ["$session_id", "$_id"]}, "result": {"$first": "$$ROOT"}}},
+    {"$replaceRoot": {"newRoot": "$result"}},
+]
+
+
+def _backfill_pipeline(group_id, fields, target):
+    return _DEDUPE_ATTEMPTS + [
+        {"$group": {
+            "_id": group_id,
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": {"$ifNull": ["$score", 0]}},
+            "max_score": {"$max": {"$ifNull": ["$score", 0]}},
+            # Results written before timestamps existed fall back to their ObjectId time
+            "last_timestamp": {"$max": {"$ifNull": ["$timestamp", {"$toDate": "$_id"}]}},
+        }},
+        {"$set": fields},
+        {"$out": target},
+    ]
+
+
+def _rebuild(target, group_id, fields):
+    # Built into a scratch collection and renamed over the live one, so analytics never
+    # sees an empty or half-built rollup. record_result updates that land while the
+    # aggregation runs are replaced by the rebuilt values, so run this at a quiet time.
+    # $out keeps the scratch collection's indexes, and the rename carries them over
+    scratch = f"{target}_rebuild"
+    db[scratch].drop()
+    for keys, options in INDEXES.get(target, []):
+        db[scratch].create_index(keys, **options)
+    db["results"].aggregate(_backfill_pipeline(group_id, fields, scratch), allowDiskUse=True)
+    db[scratch].rename(target, dropTarget=True)
+
+
+def backfill_rollups():
+    """Rebuilds both rollup collections from the full results history, server-side."""
+    username = {"$ifNull": ["$username", "unknown"]}
+    skill = {"$ifNull": ["$skill", "Unknown Skill"]}
+    _rebuild(STUDENT_ROLLUPS, username, {"username": "$_id"})
+    _rebuild(SKILL_ROLLUPS, {"username": username, "skill": skill},
+             {"username": "$_id.username", "skill": "$_id.skill"})
+
+
+def token_balances(usernames=None):
+    """Returns username and tokens of approved students, optionally only the given ones."""
+    query = {"username": {"$in": list(usernames)}} if usernames else {}
+    return [
+        {"username": s["username"], "tokens_left": s.get("tokens", 0)}
+        for s in db["access_students"].find(query, {"_id": 0, "username": 1, "tokens": 1})
+    ]
+
+
+def score_timeline(usernames=None, window="day", since=None, by_student=True):
+    """
+    Returns the average score per student per time bucket (`window` is any $dateTrunc unit:
+    day, week, month, ...), computed server-side: rows of username, timestamp, score, attempts.
+    With by_student=False all students are averaged together under COHORT.
+    """
+    match = {}
+    if usernames:
+        match["username"] = {"$in": list(usernames)}
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "username": {"$ifNull": ["$username", "unknown"]},
+            "score": {"$ifNull": ["$score", 0]},
+            "timestamp": {"$ifNull": ["$timestamp", {"$toDate": "$_id"}]},
+        }},
+    ]
+    if since is not None:
+        pipeline.append({"$match": {"timestamp": {"$gte": since}}})
+    pipeline += [
+        {"$group": {
+            "_id": {
+                "username": "$username" if by_student else COHORT,
+                "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": window}},
+            },
+            "score": {"$avg": "$score"},
+            "attempts": {"$sum": 1},
+        }},
+        {"$project": {"_id": 0, "username": "$_id.username", "timestamp": "$_id.bucket",
+                      "score": 1, "attempts": 1}},
+        {"$sort": {"timestamp": 1}},
+    ]
+    return list(read_collection("results").aggregate(pipeline))
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of points sorted by numeric x, where each
+    point is a tuple starting with (x, y). Keeps the first and last points and the most
+    visually significant point of each bucket.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        next_bucket = points[end:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        ax, ay = points[a][:2]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def build_timeline(rows, top_n=TIMELINE_TOP_N, point_budget=TIMELINE_POINT_BUDGET):
+    """
+    Shapes score_timeline rows for plotting: keeps the top_n students by attempts, merges the
+    rest into one attempt-weighted OTHERS trace, then LTTB-downsamples every trace so the
+    chart has at most about point_budget points.
+    """
+    attempts = defaultdict(int)
+    for row in rows:
+        attempts[row["username"]] += row["attempts"]
+    top = set(sorted(attempts, key=attempts.get, reverse=True)[:top_n])
+
+    traces = defaultdict(dict)  # username -> timestamp -> [score * attempts, attempts]
+    for row in rows:
+        name = row["username"] if row["username"] in top else OTHERS
+        bucket = traces[name].setdefault(row["timestamp"], [0.0, 0])
+        bucket[0] += row["score"] * row["attempts"]
+        bucket[1] += row["attempts"]
+
+    per_trace = max(3, point_budget // max(1, len(traces)))
+    shaped = []
+    for name, buckets in traces.items():
+        points = [(ts.timestamp(), total / count, ts, count) for ts, (total, count) in sorted(buckets.items())]
+        for _, score, ts, count in lttb(points, per_trace):
+            shaped.append({"username": name, "timestamp": ts, "score": score, "attempts": count})
+    return shaped
+
+
+def student_summaries():
+    """Returns one rollup per student: username, count, score_sum, max_score, last_timestamp."""
+    return list(read_collection(STUDENT_ROLLUPS).find({}, {"_id": 0}))
+
+
+def skill_summaries(usernames):
+    """Returns the per-skill rollups of the given students."""
+    return list(read_collection(SKILL_ROLLUPS).find({"username": {"$in": list(usernames)}}, {"_id": 0}))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        backfill_rollups()
+        print(f"{db[STUDENT_ROLLUPS].count_documents({})} student and "
+              f"{db[SKILL_ROLLUPS].count_documents({})} skill rollups rebuilt.")
+    else:
+        print("usage: python analytics_utils.py backfill")
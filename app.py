@@ -1,9 +1,39 @@
 import streamlit as st
 st.set_page_config(page_title="Course App", layout="wide")
+from worker_pool import get_resume_pool
+get_resume_pool()  # start the resume workers (spaCy loaded) before anyone opens AI Modules
 from student_dashboard import student_dashboard
 from instructor_panel import instructor_dashboard
 from admin_panel import admin_panel
 from student_panel import student_login, student_register, student_forgot_password
+from db_utils import db as question_db, question_cache
+from indexes import ensure_indexes
+from token_utils import init_missing_tokens
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_indexes():
+    # Runs once per server process; failures (e.g. duplicates under a unique index) are logged
+    for name, keys, error in ensure_indexes():
+        print(f"Index {name} {keys} was not created: {error}")
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_tokens():
+    # Students approved before tokens were set on approval get theirs here, not on page loads
+    return init_missing_tokens()
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_question_cache():
+    # One change-stream thread per server process; it exits quietly on a standalone server
+    return question_cache.watch(question_db)
+
+
+bootstrap_indexes()
+bootstrap_tokens()
+bootstrap_question_cache()
 
 # --------- Custom CSS for Glassmorphism ----------
 st.markdown("""
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from pymongo import AsyncMongoClient
+
+from utils import MONGODB_DB, MONGODB_URI, READ_ROUTES, client_options, read_preference
+
+# Page loads issue their independent queries concurrently on one background event loop,
+# so a page costs about as much as its slowest query instead of the sum of all of them.
+# The loop's AsyncMongoClient is the process's second pool (see utils.POOLS_PER_PROCESS).
+QUERY_TIMEOUT = 30
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _start_loop():
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-db", daemon=True).start()
+
+            async def create_client():
+                return AsyncMongoClient(MONGODB_URI, **client_options())
+            _client = asyncio.run_coroutine_threadsafe(create_client(), loop).result()
+            _loop = loop
+    return _loop
+
+
+def run(coro, timeout=QUERY_TIMEOUT):
+    """Runs a coroutine on the data-access loop and waits for its result from sync code."""
+    return asyncio.run_coroutine_threadsafe(coro, _start_loop()).result(timeout)
+
+
+def gather(*coros, timeout=QUERY_TIMEOUT):
+    """Runs independent coroutines concurrently and returns their results in order."""
+    async def all_of():
+        return await asyncio.gather(*coros)
+    return run(all_of(), timeout)
+
+
+def collection(name, database=MONGODB_DB, route=None):
+    """
+    Async collection handle for use inside coroutines passed to run()/gather(), routed like
+    utils.read_collection.
+    """
+    _start_loop()
+    route = route or READ_ROUTES.get(name, "primary")
+    return _client[database][name].with_options(read_preference=read_preference(route))
+
+
+async def find(name, query, projection=None, sort=None, limit=0, route=None):
+    cursor = collection(name, route=route).find(query, projection, sort=sort, limit=limit)
+    return await cursor.to_list(None)
+
+
+async def aggregate(name, pipeline, route=None):
+    cursor = await collection(name, route=route).aggregate(pipeline)
+    return await cursor.to_list(None)
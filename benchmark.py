@@ -0,0 +1,616 @@
+# Benchmarks for the app's hot data paths.
+# Run against a local MongoDB (or in-process mongomock: pip install mongomock), never the
+# production cluster. The app benchmarks seed a synthetic dataset first (see --help for volumes):
+#   python benchmark.py --uri mongodb://localhost:27017 questions
+#   python benchmark.py --json baseline.json
+#   python benchmark.py --json current.json --baseline baseline.json   # exits 1 on regressions
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pymongo
+
+BENCHMARKS = {}
+# Benchmarks that run the app's own modules against the seeded app database
+SEEDED = set()
+# benchmark name -> label -> measurement, written out by --json
+RESULTS = {}
+_current = None
+
+
+def benchmark(name, seeded=False):
+    def register(func):
+        BENCHMARKS[name] = func
+        if seeded:
+            SEEDED.add(name)
+        return func
+    return register
+
+
+def timed(func, repeat):
+    """Runs func `repeat` times and returns per-call timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    RESULTS[_current][label] = {"median_ms": statistics.median(timings), "min_ms": min(timings),
+                                "max_ms": max(timings), "runs": len(timings)}
+    print(f"  {label:<28} median {statistics.median(timings):9.2f} ms   "
+          f"min {min(timings):9.2f} ms   max {max(timings):9.2f} ms")
+
+
+def measure(label, func, repeat):
+    """Times and reports func; a failure (e.g. a stage mongomock lacks) is recorded instead of raised."""
+    try:
+        timings = timed(func, repeat)
+    except Exception as e:
+        RESULTS[_current][label] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"  {label:<28} failed: {type(e).__name__}: {e}")
+    else:
+        report(label, timings)
+
+
+def skip(label, reason):
+    RESULTS[_current][label] = {"skipped": reason}
+    print(f"  {label:<28} skipped: {reason}")
+
+
+def metric(label, value, unit, better="lower"):
+    """Records a measurement other than a timing; better is "lower", "higher" or None (not compared)."""
+    RESULTS[_current][label] = {"value": value, "unit": unit, "better": better}
+    print(f"  {label:<28} {value:12.1f} {unit}")
+
+
+# --------------------- Question sampling ---------------------
+def seed_question_bank(collection, per_type):
+    collection.drop()
+    docs = []
+    for difficulty in ["easy", "medium", "hard"]:
+        for qtype in ["mcqs", "coding", "blanks"]:
+            for i in range(per_type):
+                docs.append({
+                    "question": f"{qtype} question {i} " + "lorem ipsum " * 20,
+                    "type": qtype,
+                    "difficulty": difficulty,
+                    "options": [f"option {n}" for n in range(4)],
+                    "answer": "option 0",
+                    "explanation": "because " * 30,
+                    "constraints": "1 <= n <= 10^5",
+                    "input": "5",
+                    "output": "120",
+                })
+    for start in range(0, len(docs), 5000):
+        collection.insert_many(docs[start:start + 5000])
+
+
+def legacy_get_all_questions(collection, difficulty):
+    mcqs = list(collection.find({"difficulty": difficulty, "type": "mcqs"}))
+    coding = list(collection.find({"difficulty": difficulty, "type": "coding"}))
+    blanks = list(collection.find({"difficulty": difficulty, "type": "blanks"}))
+    questions = (random.sample(mcqs, min(8, len(mcqs))) + random.sample(coding, min(2, len(coding)))
+                 + random.sample(blanks, min(5, len(blanks))))
+    return random.sample(questions, len(questions))
+
+
+@benchmark("questions")
+def bench_questions(db, args):
+    from db_utils import QuestionCache, sample_questions
+
+    collection = db["bench_questions"]
+    seed_question_bank(collection, args.size)
+    print(f"question bank: {args.size} documents per (difficulty, type)")
+    report("find() + random.sample", timed(lambda: legacy_get_all_questions(collection, "medium"), args.repeat))
+    report("$facet/$sample", timed(lambda: sample_questions(collection, "medium"), args.repeat))
+
+    cache = QuestionCache(max_questions=3 * args.size)
+    cold = timed(lambda: [cache.get(collection, "bench", "medium", t) for t in ["mcqs", "coding", "blanks"]], 1)
+    report("cache fill (cold)", cold)
+    report("cache hit", timed(lambda: [cache.get(collection, "bench", "medium", t) for t in ["mcqs", "coding", "blanks"]],
+                              args.repeat))
+    collection.drop()
+
+
+# --------------------- Resume skill extraction ---------------------
+RESUME_LINES = [
+    "Software engineer with 5 years of experience building web applications in Python and JavaScript.",
+    "Designed REST APIs backed by PostgreSQL and MongoDB; wrote complex SQL reporting queries.",
+    "Built responsive front ends with HTML5, CSS3 and React; migrated legacy JS to ES6 modules.",
+    "Maintained high-throughput trading components in C++ and Java, profiling hot loops.",
+    "Led a team of four, mentoring interns and running weekly design reviews.",
+    "Education: B.Tech in Computer Science, coursework in algorithms, operating systems and networks.",
+]
+
+
+def sample_resumes(count, pages):
+    rng = random.Random(42)
+    return ["\n".join(rng.choice(RESUME_LINES) for _ in range(40 * pages)) for _ in range(count)]
+
+
+@benchmark("skills")
+def bench_skills(db, args):
+    import spacy
+    from nlp_utils import SKILL_VOCABULARY, get_skill_matcher
+
+    resumes = sample_resumes(20, pages=3)
+    print(f"corpus: {len(resumes)} resumes, {sum(map(len, resumes)) // len(resumes)} characters each on average")
+
+    try:
+        full_nlp = spacy.load("en_core_web_sm")
+    except OSError:
+        print("  en_core_web_sm is not installed; skipping the full-pipeline baseline")
+    else:
+        def legacy():
+            for text in resumes:
+                {token.text for token in full_nlp(text.lower()) if token.text in SKILL_VOCABULARY}
+        report("full spaCy pipeline", timed(legacy, max(1, args.repeat // 5)))
+
+    matcher = get_skill_matcher()
+    report("SkillMatcher", timed(lambda: [matcher.count_skills(text) for text in resumes], args.repeat))
+
+
+# --------------------- Exam session memory ---------------------
+def sample_exam(rng):
+    from bson import ObjectId
+
+    questions = []
+    for qtype, count in [("mcqs", 8), ("coding", 2), ("blanks", 5)]:
+        for i in range(count):
+            questions.append({
+                "_id": ObjectId(),
+                "question": f"{qtype} question {rng.random()} " + "lorem ipsum " * 20,
+                "type": qtype,
+                "options": [f"option {n}" for n in range(4)] if qtype != "coding" else None,
+                "answer": "option 0",
+                "explanation": "because " * 30,
+                "constraints": "1 <= n <= 10^5",
+                "input": "5",
+                "output": "120",
+            })
+    return questions
+
+
+def session_memory(build, sessions):
+    """Bytes allocated per session by keeping `sessions` results of build() alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / sessions
+
+
+@benchmark("exam-memory")
+def bench_exam_memory(db, args):
+    from exam_session import ExamSession
+
+    rng = random.Random(42)
+    sessions = min(args.size, 2000)
+    exams = [sample_exam(rng) for _ in range(sessions)]
+    print(f"{sessions} exam sessions of 15 questions, every question answered")
+
+    def legacy(i):
+        # Full question documents plus the responses list the dashboard rebuilt on every rerun
+        questions = [dict(q) for q in exams[i]]
+        responses = [{"question": q["question"], "type": q["type"], "selected": "option 1",
+                      "correct": q.get("answer")} for q in questions]
+        return questions, responses
+
+    def compact(i):
+        exam = ExamSession("bench", "medium", exams[i])
+        for n, question in enumerate(exams[i]):
+            exam.record(n, question, "option 1" if question["options"] else "print(120)")
+        return exam
+
+    metric("full documents + responses", session_memory(legacy, sessions), "bytes per session")
+    metric("ExamSession", session_memory(compact, sessions), "bytes per session")
+
+
+# --------------------- Coding answer grading ---------------------
+@benchmark("grading")
+def bench_grading(db, args):
+    import os
+    from bson import ObjectId
+    from grading import GradingPool, sandbox_available
+
+    if not sandbox_available():
+        return skip("grading", "the bubblewrap sandbox is not available here")
+    question = {"_id": ObjectId(), "input": "20", "output": str(2432902008176640000)}
+    submissions = [f"import math  # submission {i}\nprint(math.factorial(int(input())))" for i in range(64)]
+    print(f"{len(submissions)} distinct submissions, one test case each")
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        pool = GradingPool(workers=workers)
+        start = time.perf_counter()
+        results = [f.result() for f in [pool.submit(question, code) for code in submissions]]
+        seconds = time.perf_counter() - start
+        passed = sum(r.status == "passed" for r in results)
+        metric(f"{workers} worker(s)", len(submissions) / seconds, "submissions/s", better="higher")
+        if passed != len(submissions):
+            print(f"  only {passed} of {len(submissions)} submissions passed")
+
+        start = time.perf_counter()
+        [f.result() for f in [pool.submit(question, code) for code in submissions]]
+        metric(f"{workers} worker(s), cached", len(submissions) / (time.perf_counter() - start), "submissions/s",
+               better="higher")
+
+
+# --------------------- Results schema ---------------------
+@benchmark("results")
+def bench_results(db, args):
+    from datetime import datetime
+    import bson
+
+    rng = random.Random(42)
+    legacy, slim = db["bench_results_legacy"], db["bench_results"]
+    legacy.drop()
+    slim.drop()
+    legacy_docs, slim_docs = [], []
+    for i in range(args.size):
+        summary = {"session_id": str(i), "username": f"student{i % 200}", "skill": "python",
+                   "difficulty": "medium", "score": rng.randint(0, 15), "total": 15,
+                   "timestamp": datetime.utcnow(), "duration_seconds": rng.randint(60, 1800)}
+        questions = sample_exam(rng)
+        legacy_docs.append({**summary, "responses": [
+            {"question": q["question"], "type": q["type"], "selected": "option 1", "correct": q["answer"]}
+            for q in questions
+        ]})
+        slim_docs.append(summary)
+    legacy.insert_many(legacy_docs)
+    slim.insert_many(slim_docs)
+
+    for label, docs in [("with embedded responses", legacy_docs), ("summary only", slim_docs)]:
+        metric(label, sum(len(bson.encode(d)) for d in docs) / len(docs), "bytes per result")
+    scan = {"_id": 0, "username": 1, "score": 1, "timestamp": 1}
+    report("analytics scan (embedded)", timed(lambda: list(legacy.find({}, scan)), args.repeat))
+    report("analytics scan (summary)", timed(lambda: list(slim.find({}, scan)), args.repeat))
+    legacy.drop()
+    slim.drop()
+
+
+# --------------------- Token debit under concurrency ---------------------
+def legacy_debit(collection, username):
+    # The old start-assessment flow: read the balance, then decrement unconditionally
+    student = collection.find_one({"username": username})
+    if student["tokens"] <= 0:
+        return None
+    collection.update_one({"username": username}, {"$inc": {"tokens": -1}})
+    return student["tokens"] - 1
+
+
+NO_ATOMIC = "mongomock's find_one_and_update is not atomic, so the verdicts would be inverted"
+
+
+@benchmark("token-debit")
+def bench_token_debit(db, args):
+    if args.uri.startswith("mongomock://"):
+        return skip("token debit", NO_ATOMIC)
+    from token_utils import debit_token
+
+    collection = db["bench_access_students"]
+    tokens, threads = 100, 32
+    attempts = tokens * 10
+    print(f"{attempts} concurrent starts from {threads} threads against a balance of {tokens}")
+
+    for label, debit in [("read then $inc", legacy_debit),
+                         ("find_one_and_update", lambda col, name: debit_token(name, col))]:
+        collection.drop()
+        collection.insert_one({"username": "bench", "tokens": tokens})
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            granted = sum(r is not None for r in pool.map(lambda _: debit(collection, "bench"), range(attempts)))
+        seconds = time.perf_counter() - start
+        balance = collection.find_one({"username": "bench"})["tokens"]
+        verdict = "ok" if granted == tokens and balance == 0 else "OVERDRAFT" if balance < 0 else "MISMATCH"
+        metric(f"{label} throughput", attempts / seconds, "req/s", better="higher")
+        metric(f"{label} final balance", balance, "tokens", better=None)
+        print(f"  {label:<28} granted {granted} of {tokens}: {verdict}")
+    collection.drop()
+
+
+# --------------------- Log writes ---------------------
+@benchmark("log-writer")
+def bench_log_writer(db, args):
+    from log_writer import LogWriter
+
+    collection = db["bench_logs"]
+    entries = [{"student": f"s{i}", "instructor": "bench", "action": "Token Increment", "tokens_changed": 1}
+               for i in range(args.size)]
+    print(f"{len(entries)} audit entries")
+
+    collection.drop()
+    report("insert_one per click", timed(lambda: [collection.insert_one(dict(e)) for e in entries[:100]], args.repeat))
+
+    collection.drop()
+    writer = LogWriter(database=db, max_queue=len(entries))
+    report("LogWriter.write per click", timed(lambda: [writer.write("bench_logs", dict(e)) for e in entries[:100]],
+                                              args.repeat))
+    start = time.perf_counter()
+    writer.write_many("bench_logs", [dict(e) for e in entries])
+    writer.flush()
+    metric("write-behind of all entries", (time.perf_counter() - start) * 1000, "ms")
+    writer.close()
+    metrics = writer.metrics()
+    metric("insert_many calls", metrics["batches"], "calls")
+    print(f"  {metrics['written']} entries written, {metrics['dropped']} dropped, peak queue {metrics['max_depth']}")
+    collection.drop()
+
+
+# --------------------- Seeded app data ---------------------
+STATUSES = ["approved"] * 8 + ["pending", "rejected"]
+NO_ASYNC = "async_db needs a MongoDB server; mongomock has no async client"
+
+
+def skill_names(args):
+    return [f"skill{n}" for n in range(args.skills)]
+
+
+def insert_chunked(collection, docs, chunk=5000):
+    collection.drop()
+    for start in range(0, len(docs), chunk):
+        collection.insert_many(docs[start:start + chunk])
+
+
+def student(prefix, i, rng):
+    return {"name": f"{prefix.title()} {i}", "email": f"{prefix}{i}@example.com", "phone": f"{rng.randrange(10**9, 10**10)}",
+            "username": f"{prefix}{i}", "password": "secret", "role": "student"}
+
+
+def seed_app_data(client, args):
+    """
+    Fills the app and question databases with deterministic synthetic data at the volumes
+    given on the command line, then builds the indexes and analytics rollups the app expects.
+    """
+    from bson import ObjectId
+
+    rng = random.Random(args.random_seed)
+    db, question_db = client[args.db], client[f"{args.db}_questions"]
+    now = datetime.utcnow()
+
+    insert_chunked(db["student_registrations"], [student("pending", i, rng) for i in range(args.students)])
+    insert_chunked(db["not_access_students"], [student("rejected", i, rng) for i in range(args.students)])
+    insert_chunked(db["access_students"], [
+        {**student("student", i, rng), "tokens": rng.randint(0, 10), "exam_attempts": rng.randint(0, 5), "profile_version": 0}
+        for i in range(args.students)
+    ])
+
+    courses = [{"_id": ObjectId(), "title": f"Course {i}", "instructor": f"instructor{i % 20}",
+                "description": "lorem ipsum " * 20, "price": rng.choice([0, 0, 0, 499]), "status": rng.choice(STATUSES)}
+               for i in range(args.courses)]
+    insert_chunked(db["courses"], courses)
+    contents = [{"_id": ObjectId(), "course_id": course["_id"], "title": f"{course['title']} lesson {n}",
+                 "access": rng.choice(["free", "free", "paid"])}
+                for course in courses for n in range(args.contents)]
+    insert_chunked(db["course_content"], contents)
+
+    enrollments, purchases = [], []
+    paid = [c for c in contents if c["access"] == "paid"]
+    for i in range(args.students):
+        for course in rng.sample(courses, min(args.enrollments, len(courses))):
+            enrollments.append({"username": f"student{i}", "course_id": course["_id"],
+                                "status": rng.choice(STATUSES[:9]), "enrolled_on": now})
+        for content in rng.sample(paid, min(2, len(paid))):
+            purchases.append({"username": f"student{i}", "content_id": content["_id"]})
+    insert_chunked(db["enrollments"], enrollments)
+    insert_chunked(db["purchases"], purchases)
+
+    for skill in skill_names(args):
+        seed_question_bank(question_db[skill], args.questions)
+
+    results = [{"session_id": str(i), "username": f"student{rng.randrange(args.students)}",
+                "skill": rng.choice(skill_names(args)), "difficulty": rng.choice(["easy", "medium", "hard"]),
+                "score": rng.randint(0, 15), "total": 15, "duration_seconds": rng.randint(60, 1800),
+                "timestamp": now - timedelta(minutes=rng.randrange(180 * 24 * 60))}
+               for i in range(args.results)]
+    insert_chunked(db["results"], results)
+    insert_chunked(db["token_logs"], [
+        {"student": f"student{rng.randrange(args.students)}", "instructor": f"instructor{i % 20}",
+         "action": "Token Increment", "tokens_changed": 1, "timestamp": now - timedelta(seconds=i)}
+        for i in range(args.token_logs)
+    ])
+    insert_chunked(db["instructor_logs"], [
+        {"username": f"instructor{i % 20}", "action": "Uploaded content", "timestamp": now - timedelta(seconds=i)}
+        for i in range(min(args.token_logs, 1000))
+    ])
+
+    from analytics_utils import backfill_rollups, record_result
+    from indexes import ensure_indexes
+
+    for name, keys, error in ensure_indexes():
+        print(f"  index {name} {keys} was not created: {error}")
+    try:
+        backfill_rollups()
+    except (pymongo.errors.OperationFailure, NotImplementedError):
+        # mongomock cannot run the backfill pipeline; fold the results in one at a time instead
+        for result in results:
+            record_result(result)
+
+
+@benchmark("get-all-questions", seeded=True)
+def bench_get_all_questions(db, args):
+    from db_utils import get_all_questions, question_cache
+
+    skill = skill_names(args)[0]
+
+    def cold():
+        question_cache.invalidate()
+        get_all_questions(skill, "medium")
+    measure("cold cache", cold, args.repeat)
+    measure("warm cache", lambda: get_all_questions(skill, "medium"), args.repeat)
+
+
+@benchmark("admin-dashboard", seeded=True)
+def bench_admin_dashboard(db, args):
+    if args.uri.startswith("mongomock://"):
+        return skip("dashboard", NO_ASYNC)
+    import async_db
+    from admin_utils import clear_dashboard_summary, fetch_page, load_dashboard_summary, search_filter
+
+    def summary():
+        clear_dashboard_summary()
+        async_db.run(load_dashboard_summary())
+
+    def page():
+        # The batch load_admin_page runs, minus its session-state pager bookkeeping
+        clear_dashboard_summary()
+        async_db.gather(
+            load_dashboard_summary(),
+            async_db.find("instructor_logs", {}, sort=[("timestamp", -1)], limit=50),
+            fetch_page("student_registrations", {}), fetch_page("access_students", {}),
+            fetch_page("not_access_students", {}), fetch_page("courses", {"status": "pending"}),
+        )
+    measure("summary counters", summary, args.repeat)
+    measure("full page load", page, args.repeat)
+    measure("student prefix search",
+            lambda: async_db.run(fetch_page("access_students", search_filter("student1", ["username", "email"]))),
+            args.repeat)
+
+
+@benchmark("analytics", seeded=True)
+def bench_analytics(db, args):
+    from analytics_utils import build_timeline, score_timeline, skill_summaries, student_summaries, token_balances
+    from results_utils import recent_attempts
+
+    students = [f"student{i}" for i in range(min(2, args.students))]
+    measure("token balances", token_balances, args.repeat)
+    measure("student summaries", student_summaries, args.repeat)
+    measure("skill summaries", lambda: skill_summaries(students), args.repeat)
+    if args.uri.startswith("mongomock://"):
+        skip("score timeline", "mongomock has no $dateTrunc")
+    else:
+        measure("score timeline (per student)", lambda: build_timeline(score_timeline(None, "day")), args.repeat)
+        measure("score timeline (cohort)", lambda: score_timeline(None, "week", by_student=False), args.repeat)
+    measure("attempt list", lambda: recent_attempts(students[0]), args.repeat)
+
+
+@benchmark("course-views", seeded=True)
+def bench_course_views(db, args):
+    if args.uri.startswith("mongomock://"):
+        return skip("course views", NO_ASYNC)
+    from course_utils import CourseLoader
+
+    rng = random.Random(args.random_seed)
+    students = [f"student{rng.randrange(args.students)}" for _ in range(args.repeat)]
+    picks = iter(students * 2)
+    measure("catalog", lambda: CourseLoader(next(picks)).catalog(), args.repeat)
+    measure("my courses", lambda: CourseLoader(next(picks)).my_courses(), args.repeat)
+
+
+# --------------------- Harness ---------------------
+def compare(baseline, meta, tolerance, min_delta_ms):
+    """
+    Prints every measurement against the baseline and returns the ones that regressed: worse
+    by more than `tolerance` (relative) and, for timings, by more than min_delta_ms.
+    """
+    regressions = []
+    print(f"[compared with baseline from {baseline.get('meta', {}).get('timestamp', '?')}]")
+    for key in ["server", "repeat", "size", "volumes"]:
+        if baseline.get("meta", {}).get(key) != meta[key]:
+            print(f"  warning: baseline was run with a different {key}: {baseline.get('meta', {}).get(key)}")
+    for name, entries in RESULTS.items():
+        for label, current in entries.items():
+            before = baseline.get("results", {}).get(name, {}).get(label, {})
+            if "median_ms" in current and "median_ms" in before:
+                old, new, better = before["median_ms"], current["median_ms"], "lower"
+            elif "value" in current and "value" in before and current.get("better"):
+                old, new, better = before["value"], current["value"], current["better"]
+            else:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = change > tolerance if better == "lower" else change < -tolerance
+            if "median_ms" in current and new - old < min_delta_ms:
+                regressed = False
+            current.update(baseline=old, change=change, regressed=regressed)
+            print(f"  {name + ' / ' + label:<48} {old:12.2f} -> {new:12.2f}  {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{name} / {label}")
+    return regressions
+
+
+def main():
+    global _current
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot data paths.")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB URI, or mongomock:// to run in-process")
+    parser.add_argument("--db", default="benchmark", help="database to seed (questions go to <db>_questions)")
+    parser.add_argument("--size", type=int, default=10000, help="documents per seeded group")
+    parser.add_argument("--repeat", type=int, default=20)
+    volumes = parser.add_argument_group("seeded volumes")
+    volumes.add_argument("--students", type=int, default=2000, help="students in each of pending, approved, rejected")
+    volumes.add_argument("--courses", type=int, default=200)
+    volumes.add_argument("--contents", type=int, default=5, help="content items per course")
+    volumes.add_argument("--enrollments", type=int, default=5, help="enrollments per approved student")
+    volumes.add_argument("--skills", type=int, default=3, help="question banks")
+    volumes.add_argument("--questions", type=int, default=1000, help="questions per (skill, difficulty, type)")
+    volumes.add_argument("--results", type=int, default=20000)
+    volumes.add_argument("--token-logs", type=int, default=20000)
+    volumes.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data of a previous run")
+    parser.add_argument("--json", help="write the measurements to this file")
+    parser.add_argument("--baseline", help="compare with a file written by --json; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="timing changes below this are never regressions")
+    args = parser.parse_args()
+
+    if not args.db.startswith("bench"):
+        parser.error("--db must start with 'bench': seeding drops the collections it fills")
+    if args.uri.startswith("mongomock://"):
+        try:
+            import mongomock
+        except ImportError:
+            parser.error("mongomock:// needs the mongomock package (pip install mongomock)")
+        client = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *a, **k: client  # before any app module binds it
+    else:
+        client = pymongo.MongoClient(args.uri)
+    # The app modules read their connection settings from the environment on import
+    os.environ.update(MONGODB_URI=args.uri, MONGODB_DB=args.db, MONGODB_QUESTION_DB=f"{args.db}_questions")
+
+    if not args.no_seed and SEEDED.intersection(args.names):
+        start = time.perf_counter()
+        seed_app_data(client, args)
+        print(f"[seeded {args.db} in {time.perf_counter() - start:.1f} s]")
+
+    db = client[args.db]
+    for name in args.names:
+        print(f"[{name}]")
+        _current = name
+        RESULTS[name] = {}
+        BENCHMARKS[name](db, args)
+
+    meta = {
+        "timestamp": datetime.utcnow().isoformat(), "python": platform.python_version(),
+        "platform": platform.platform(), "server": args.uri.split(":", 1)[0], "db": args.db,
+        "repeat": args.repeat, "size": args.size,
+        "volumes": {name: getattr(args, name) for name in
+                    ["students", "courses", "contents", "enrollments", "skills", "questions", "results",
+                     "token_logs", "random_seed"]},
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), meta, args.tolerance, args.min_delta_ms)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": RESULTS}, f, indent=2, default=str)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
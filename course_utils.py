@@ -0,0 +1,98 @@
+import asyncio
+from collections import defaultdict
+from typing import NamedTuple
+
+import async_db
+
+
+class CatalogEntry(NamedTuple):
+    course: dict
+    enrollment: dict | None
+
+
+class EnrolledCourse(NamedTuple):
+    enrollment: dict
+    course: dict
+    contents: list  # [(content, purchased)]
+
+
+class CourseLoader:
+    """
+    Batched loads for the student course views: each collection is read with at most one
+    $in query, independent queries run concurrently, and results are joined in memory.
+    Lookups are memoized, so create one loader per script run and share it between views.
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self._memo = {}
+
+    async def _memoized(self, key, load):
+        if key not in self._memo:
+            self._memo[key] = await load()
+        return self._memo[key]
+
+    async def enrollments(self):
+        """Returns {course_id: enrollment} for every enrollment of the student."""
+        async def load():
+            return {e["course_id"]: e for e in await async_db.find("enrollments", {"username": self.username})}
+        return await self._memoized("enrollments", load)
+
+    async def courses(self):
+        return await self._memoized("courses", lambda: async_db.find("courses", {}))
+
+    async def courses_by_id(self, course_ids):
+        course_ids = list(course_ids)
+
+        async def load():
+            return {c["_id"]: c for c in await async_db.find("courses", {"_id": {"$in": course_ids}})}
+        return await self._memoized(("courses", tuple(course_ids)), load)
+
+    async def contents_by_course(self, course_ids):
+        course_ids = list(course_ids)
+
+        async def load():
+            contents = defaultdict(list)
+            for content in await async_db.find("course_content", {"course_id": {"$in": course_ids}}):
+                contents[content["course_id"]].append(content)
+            return contents
+        return await self._memoized(("contents", tuple(course_ids)), load)
+
+    async def purchased_content_ids(self, content_ids):
+        content_ids = list(content_ids)
+
+        async def load():
+            purchases = await async_db.find(
+                "purchases", {"username": self.username, "content_id": {"$in": content_ids}}, {"content_id": 1}
+            )
+            return {p["content_id"] for p in purchases}
+        return await self._memoized(("purchases", tuple(content_ids)), load)
+
+    async def _catalog(self):
+        enrollments, courses = await asyncio.gather(self.enrollments(), self.courses())
+        return [CatalogEntry(course, enrollments.get(course["_id"])) for course in courses]
+
+    async def _my_courses(self):
+        enrollments = [e for e in (await self.enrollments()).values() if e.get("status") == "approved"]
+        course_ids = [e["course_id"] for e in enrollments]
+        # Contents only need the enrollment's course ids, so they load alongside the courses
+        courses, contents = await asyncio.gather(self.courses_by_id(course_ids), self.contents_by_course(course_ids))
+        paid_ids = [c["_id"] for items in contents.values() for c in items if c["access"] != "free"]
+        purchased = await self.purchased_content_ids(paid_ids) if paid_ids else set()
+
+        return [
+            EnrolledCourse(enrollment, courses[enrollment["course_id"]], [
+                (content, content["_id"] in purchased)
+                for content in contents.get(enrollment["course_id"], [])
+            ])
+            for enrollment in enrollments
+            if enrollment["course_id"] in courses
+        ]
+
+    def catalog(self):
+        """Returns a CatalogEntry(course, enrollment or None) for every course."""
+        return async_db.run(self._catalog())
+
+    def my_courses(self):
+        """Returns an EnrolledCourse(enrollment, course, [(content, purchased)]) per approved enrollment."""
+        return async_db.run(self._my_courses())
@@ -0,0 +1,107 @@
+from array import array
+from datetime import datetime
+
+from bson import ObjectId
+
+from db_utils import get_questions_by_id
+from grading import get_grading_pool, sandbox_available, test_cases
+
+QUESTION_TYPES = ("mcqs", "coding", "blanks")
+NO_CHOICE = -1
+
+
+class ExamSession:
+    """
+    What an assessment keeps in st.session_state: the question ids packed into one bytes
+    object, one byte per question for its type and for the chosen option, and the typed
+    answers. Question text and the answer key are resolved from the shared question cache
+    when needed, so they never live in session state.
+    """
+
+    __slots__ = ("skill", "difficulty", "started_at", "_ids", "_types", "_choices", "_texts")
+
+    def __init__(self, skill, difficulty, questions):
+        self.skill = skill
+        self.difficulty = difficulty
+        self.started_at = datetime.utcnow()
+        self._ids = b"".join(ObjectId(q["_id"]).binary for q in questions)
+        self._types = array("b", (QUESTION_TYPES.index(q["type"]) for q in questions))
+        self._choices = array("b", [NO_CHOICE]) * len(questions)
+        self._texts = [None] * len(questions)  # only questions answered in a text area
+
+    def __len__(self):
+        return len(self._types)
+
+    def _ref(self, i):
+        return QUESTION_TYPES[self._types[i]], ObjectId(self._ids[12 * i:12 * i + 12])
+
+    def question(self, i):
+        """The full question document at position i, or None if it was deleted from the bank."""
+        qtype, question_id = self._ref(i)
+        return get_questions_by_id(self.skill, self.difficulty, [(qtype, question_id)]).get(question_id)
+
+    def questions(self):
+        """All question documents in exam order, resolved in one batch."""
+        refs = [self._ref(i) for i in range(len(self))]
+        found = get_questions_by_id(self.skill, self.difficulty, refs)
+        return [found.get(question_id) for _, question_id in refs]
+
+    def choice(self, i):
+        """Index of the chosen option at position i, or None."""
+        return None if self._choices[i] == NO_CHOICE else self._choices[i]
+
+    def text(self, i):
+        return self._texts[i] or ""
+
+    def record(self, i, question, answer):
+        """Stores the answer to question i: an option index if it has options, else the text."""
+        options = question.get("options")
+        if question["type"] in ("mcqs", "blanks") and options:
+            self._choices[i] = options.index(answer) if answer in options else NO_CHOICE
+        else:
+            self._texts[i] = answer or None
+
+    def selected(self, i, question):
+        """The answer to question i as the student gave it (option text or typed text)."""
+        if self._choices[i] != NO_CHOICE:
+            return question["options"][self._choices[i]]
+        return self._texts[i] or ""
+
+    def grade(self):
+        """
+        Returns (score, answers) with one answer record per question, as stored in
+        result_responses: question_id, type, choice or text, correct, and test counts for
+        coding answers. Coding answers with test cases are run by the grading pool, all of
+        them concurrently; without a working sandbox they are compared as strings.
+        """
+        questions = self.questions()
+        runs = {}
+        if sandbox_available():
+            pool = get_grading_pool()
+            runs = {
+                i: pool.submit(question, self._texts[i])
+                for i, question in enumerate(questions)
+                if question is not None and question["type"] == "coding" and self._texts[i] and test_cases(question)
+            }
+
+        answers = []
+        for i, question in enumerate(questions):
+            qtype, question_id = self._ref(i)
+            answer = {"question_id": question_id, "type": qtype}
+            if self._choices[i] != NO_CHOICE:
+                answer["choice"] = self._choices[i]
+            elif self._texts[i]:
+                answer["text"] = self._texts[i]
+
+            if question is None:  # deleted from the bank since the exam started
+                answer["correct"] = False
+            elif i in runs:
+                result = runs[i].result()
+                answer.update(correct=result.status == "passed", tests_passed=result.passed,
+                              tests_total=result.total, grading=result.status)
+            else:
+                correct = question.get("answer")
+                answer["correct"] = (isinstance(correct, str)
+                                     and self.selected(i, question).strip().lower() == correct.strip().lower())
+            answers.append(answer)
+        return sum(answer["correct"] for answer in answers), answers
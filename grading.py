@@ -0,0 +1,271 @@
+import hashlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from pool_utils import JobCache, process_singleton
+
+# Coding answers run against the question's input/output in a fresh interpreter per test,
+# inside a bubblewrap sandbox: no network, no view of the host filesystem beyond the
+# interpreter, its standard library and the shared libraries it loads (all read-only), its
+# own PID namespace, and an unprivileged uid. Each test also gets
+# CPU-time, address-space, output-file and process-count limits and a wall-clock timeout,
+# after which its whole process group is killed. GRADING_WORKERS tests run at once. Where
+# the sandbox is unavailable, coding answers are graded by string comparison instead.
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", os.cpu_count() or 1))
+GRADING_TEST_TIMEOUT = float(os.getenv("GRADING_TEST_TIMEOUT", 5))
+GRADING_CPU_SECONDS = int(os.getenv("GRADING_CPU_SECONDS", 2))
+GRADING_MEMORY_MB = int(os.getenv("GRADING_MEMORY_MB", 256))
+GRADING_OUTPUT_BYTES = int(os.getenv("GRADING_OUTPUT_BYTES", 1024 * 1024))
+GRADING_MAX_PROCESSES = int(os.getenv("GRADING_MAX_PROCESSES", 16))
+GRADING_BWRAP = os.getenv("GRADING_BWRAP") or shutil.which("bwrap")
+# Host account the sandbox runs as when the server itself runs as root, and the interpreter
+# it runs (submissions only need the standard library; it must be readable by that account)
+GRADING_USER = os.getenv("GRADING_USER", "nobody")
+GRADING_PYTHON = os.getenv("GRADING_PYTHON", sys.executable)
+GRADING_CACHE_SIZE = 4096
+
+SANDBOX_DIR = "/sandbox"
+
+# Applies the limits inside the child before running the submission, so the server never
+# needs preexec_fn (which is unsafe in a threaded process)
+_LAUNCHER = """
+import resource, sys
+cpu, memory, output, processes = map(int, sys.argv[2:6])
+# SIGXCPU at the soft CPU limit, SIGKILL a second later if it is ignored
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+path = sys.argv[1]
+sys.argv = [path]
+with open(path, encoding="utf-8") as f:
+    source = f.read()
+exec(compile(source, path, "exec"), {"__name__": "__main__"})
+"""
+
+
+class GradeResult(NamedTuple):
+    passed: int
+    total: int
+    status: str  # "passed", "failed", "error", "timeout" or "no tests"
+    detail: str = ""
+
+
+def test_cases(question):
+    """Returns [(stdin, expected stdout)] for a coding question (empty if it has none)."""
+    if question.get("output") is None:
+        return []
+    return [(str(question.get("input") or ""), str(question["output"]))]
+
+
+def _normalize(output):
+    return "\n".join(line.rstrip() for line in output.strip().splitlines())
+
+
+# Asks the grading interpreter where it really lives and where its standard library is
+_RUNTIME_PROBE = ("import sys, sysconfig; print(sys.executable); "
+                  "print(sysconfig.get_path('stdlib')); print(sysconfig.get_path('platstdlib'))")
+
+
+def _shared_libraries(paths):
+    """Paths of the shared libraries (the dynamic loader included) the given ELF files load."""
+    output = subprocess.run(["ldd", *paths], capture_output=True, text=True, timeout=30).stdout
+    libraries = set()
+    for line in output.splitlines():
+        fields = line.split()
+        if "=>" in fields:  # "libc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x...)"
+            fields = fields[fields.index("=>") + 1:]
+        elif fields and fields[0].endswith(":"):  # "path:" headers when given several files
+            continue
+        if fields and fields[0].startswith("/"):
+            libraries.add(fields[0])
+    return libraries
+
+
+def _find_runtime():
+    """
+    Returns (interpreter, stdlib, read-only binds) for the sandbox: the interpreter binary, its
+    standard library and every shared library it or its extension modules load, each
+    bound at the path the loader looks for it. Nothing else of the host is visible.
+    """
+    probe = subprocess.run([GRADING_PYTHON, "-I", "-S", "-c", _RUNTIME_PROBE],
+                           capture_output=True, text=True, check=True, timeout=30)
+    executable, stdlib, platstdlib = probe.stdout.split("\n")[:3]
+    executable = os.path.realpath(executable)
+    dynload = os.path.join(platstdlib, "lib-dynload")
+    modules = [os.path.join(dynload, name) for name in os.listdir(dynload) if name.endswith(".so")]
+    binds = [executable, stdlib, platstdlib]
+    for library in sorted(_shared_libraries([executable, *modules])):
+        binds += [library, os.path.realpath(library)]
+    return executable, stdlib, list(dict.fromkeys(binds))
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def _sandbox_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = _find_runtime()
+    return _runtime
+
+
+def _sandbox_command(workdir, limits):
+    executable, stdlib, binds = _sandbox_runtime()
+    command = [
+        GRADING_BWRAP, "--unshare-all", "--unshare-user", "--die-with-parent", "--new-session",
+        "--uid", "65534", "--gid", "65534", "--clearenv",
+        "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp",
+    ]
+    for path in binds:
+        command += ["--ro-bind", path, path]
+    # The stdlib directory may hold site-packages; -S never reads it, so hide it entirely
+    site_packages = os.path.join(stdlib, "site-packages")
+    if os.path.isdir(site_packages):
+        command += ["--tmpfs", site_packages]
+    command += ["--ro-bind-try", "/etc/ld.so.cache", "/etc/ld.so.cache"]
+    return command + [
+        "--bind", workdir, SANDBOX_DIR, "--chdir", SANDBOX_DIR, "--", executable, "-I", "-S", "-c", _LAUNCHER,
+        f"{SANDBOX_DIR}/solution.py", *map(str, limits),
+    ]
+
+
+def _host_user():
+    """Popen user/group arguments that drop root before the sandbox starts."""
+    if not hasattr(os, "geteuid") or os.geteuid() != 0:
+        return {}
+    import pwd
+    account = pwd.getpwnam(GRADING_USER)
+    return {"user": account.pw_uid, "group": account.pw_gid, "extra_groups": []}
+
+
+def _kill_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _killed_by(returncode, signum):
+    # bwrap reports a child killed by a signal as 128 + signal
+    return returncode in (-signum, 128 + signum)
+
+
+def _run_test(code, stdin, expected):
+    with tempfile.TemporaryDirectory(prefix="grading-") as workdir:
+        path = os.path.join(workdir, "solution.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        user = _host_user()
+        if user:
+            for owned in (workdir, path):
+                os.chown(owned, user["user"], user["group"])
+        limits = [GRADING_CPU_SECONDS, GRADING_MEMORY_MB * 1024 * 1024, GRADING_OUTPUT_BYTES, GRADING_MAX_PROCESSES]
+        with open(os.path.join(workdir, "stdout"), "w+b") as stdout, \
+                open(os.path.join(workdir, "stderr"), "w+b") as stderr:
+            process = subprocess.Popen(_sandbox_command(workdir, limits), stdin=subprocess.PIPE, stdout=stdout, stderr=stderr,
+                                       cwd=workdir, env={}, start_new_session=True, **user)
+            try:
+                process.communicate(stdin.encode(), timeout=GRADING_TEST_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                return "timeout", f"took longer than {GRADING_TEST_TIMEOUT:g}s"
+            finally:
+                # Whatever the submission started goes with it
+                _kill_group(process)
+                process.wait()
+            stdout.seek(0)
+            output = stdout.read(GRADING_OUTPUT_BYTES).decode(errors="replace")
+            stderr.seek(0)
+            error = stderr.read(GRADING_OUTPUT_BYTES).decode(errors="replace").strip().splitlines()
+    if _killed_by(process.returncode, signal.SIGXCPU):
+        return "timeout", f"used more than {GRADING_CPU_SECONDS}s of CPU time"
+    if process.returncode != 0:
+        return "error", error[-1] if error else f"exit code {process.returncode}"
+    if _normalize(output) != _normalize(expected):
+        return "failed", "wrong output"
+    return "passed", ""
+
+
+_sandbox_ok = None
+_sandbox_lock = threading.Lock()
+
+
+def sandbox_available():
+    """
+    True if bubblewrap is installed and a trivial program runs and passes inside the
+    sandbox (user namespaces can be disabled by the host). Checked once per process.
+    """
+    global _sandbox_ok
+    with _sandbox_lock:
+        if _sandbox_ok is None:
+            _sandbox_ok = False
+            if GRADING_BWRAP and hasattr(signal, "SIGXCPU"):
+                try:
+                    _sandbox_ok = _run_test("print(input())", "ok", "ok")[0] == "passed"
+                except (OSError, LookupError, ValueError, subprocess.SubprocessError):
+                    pass
+    return _sandbox_ok
+
+
+def grade_code(question, code):
+    """Runs code against every test case of the question, stopping at the first failure."""
+    tests = test_cases(question)
+    if not tests:
+        return GradeResult(0, 0, "no tests")
+    passed = 0
+    for stdin, expected in tests:
+        status, detail = _run_test(code, stdin, expected)
+        if status != "passed":
+            return GradeResult(passed, len(tests), status, detail)
+        passed += 1
+    return GradeResult(passed, len(tests), "passed")
+
+
+def code_digest(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+class GradingPool:
+    """
+    Grades coding answers on worker threads that each drive one sandboxed subprocess at a
+    time, off the Streamlit script thread. Jobs are keyed by (question id, code digest):
+    identical submissions share one job, and results are kept in an LRU so resubmissions
+    and reruns of the results page return at once.
+    """
+
+    def __init__(self, workers=GRADING_WORKERS, cache_size=GRADING_CACHE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grader")
+        self._jobs = JobCache(cache_size)  # (question id, digest) -> GradeResult
+        self._lock = threading.Lock()
+
+    def submit(self, question, code):
+        """Returns a future for the GradeResult of code on question."""
+        key = (question["_id"], code_digest(code))
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(grade_code, question, code)
+            self._jobs.start(key, future)
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        ok = not future.cancelled() and future.exception() is None
+        with self._lock:
+            self._jobs.finish(key, future, ok, future.result() if ok else None)
+
+
+@process_singleton
+def get_grading_pool():
+    """Returns the process-wide grading pool."""
+    return GradingPool()
@@ -0,0 +1,146 @@
+import sys
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from db_utils import db as question_db
+from utils import db
+
+# collection -> [(keys, options)]; every query the app runs on a growing collection
+# should be served by one of these
+INDEXES = {
+    "access_students": [
+        ([("username", 1)], {"unique": True}),
+        ([("email", 1)], {}),
+    ],
+    "student_registrations": [
+        ([("username", 1)], {"unique": True}),
+        ([("email", 1)], {"unique": True}),
+    ],
+    "not_access_students": [
+        ([("username", 1)], {}),
+        ([("email", 1)], {}),
+    ],
+    "instructors": [
+        ([("username", 1)], {"unique": True}),
+    ],
+    "courses": [
+        ([("status", 1), ("_id", 1)], {}),
+    ],
+    "course_content": [
+        ([("course_id", 1)], {}),
+    ],
+    "enrollments": [
+        ([("username", 1), ("course_id", 1)], {"unique": True}),
+    ],
+    "purchases": [
+        ([("username", 1), ("content_id", 1)], {}),
+    ],
+    "token_logs": [
+        ([("instructor", 1), ("timestamp", -1)], {}),
+    ],
+    "token_usage_logs": [
+        ([("username", 1), ("used_on", -1)], {}),
+    ],
+    "instructor_logs": [
+        ([("timestamp", -1)], {}),
+    ],
+    "results": [
+        ([("session_id", 1)], {"unique": True}),
+        ([("username", 1), ("timestamp", 1)], {}),
+    ],
+    "result_responses": [
+        ([("session_id", 1)], {"unique": True}),
+    ],
+    "student_skill_rollups": [
+        ([("username", 1)], {}),
+    ],
+}
+
+# Created on every collection of the question database (one collection per skill);
+# updatedAt lets QuestionCache read a bank's version from the index alone
+QUESTION_INDEXES = [
+    ([("difficulty", 1), ("type", 1), ("updatedAt", 1)], {}),
+]
+
+# (collection, filter, sort) for the app's hot queries, checked by `python indexes.py check`
+KNOWN_QUERIES = [
+    ("access_students", {"username": "alice", "password": "secret"}, None),
+    ("student_registrations", {"email": "alice@example.com"}, None),
+    ("student_registrations", {"username": "alice"}, None),
+    ("student_registrations", {"$or": [{"username": {"$regex": "^al"}}, {"email": {"$regex": "^al"}}]}, None),
+    ("instructors", {"username": "alice", "password": "secret"}, None),
+    ("courses", {"status": "pending"}, [("_id", 1)]),
+    ("course_content", {"course_id": {"$in": [ObjectId()]}}, None),
+    ("enrollments", {"username": "alice"}, None),
+    ("purchases", {"username": "alice", "content_id": {"$in": [ObjectId()]}}, None),
+    ("token_logs", {"instructor": "bob"}, [("timestamp", -1)]),
+    ("instructor_logs", {}, [("timestamp", -1)]),
+    ("results", {"session_id": "x"}, None),
+    ("results", {"username": "alice"}, [("timestamp", -1)]),
+    ("result_responses", {"session_id": "x"}, None),
+    ("student_skill_rollups", {"username": {"$in": ["alice"]}}, None),
+]
+
+
+def _question_collections():
+    return [name for name in question_db.list_collection_names() if not name.startswith("system.")]
+
+
+def ensure_indexes():
+    """
+    Creates every registered index. Idempotent: existing indexes are left as they are.
+    Returns a list of (collection, keys, error) for indexes that could not be built, for
+    example a unique index over data that already has duplicates.
+    """
+    targets = [(db[name], keys, options) for name, specs in INDEXES.items() for keys, options in specs]
+    targets += [(question_db[name], keys, options) for name in _question_collections()
+                for keys, options in QUESTION_INDEXES]
+
+    failures = []
+    for collection, keys, options in targets:
+        try:
+            collection.create_index(keys, **options)
+        except OperationFailure as e:
+            failures.append((collection.name, keys, str(e)))
+    return failures
+
+
+def _plan_stages(plan):
+    yield plan.get("stage")
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            yield from _plan_stages(child)
+
+
+def check_query_plans():
+    """Explains every known query and returns [(collection, filter, stages)] for collection scans."""
+    queries = [(db[name], query, sort) for name, query, sort in KNOWN_QUERIES]
+    queries += [(question_db[name], {"difficulty": "easy", "type": "mcqs"}, None) for name in _question_collections()]
+
+    scans = []
+    for collection, query, sort in queries:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = list(_plan_stages(winning.get("queryPlan", winning)))
+        if "COLLSCAN" in stages:
+            scans.append((collection.name, query, stages))
+    return scans
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "ensure":
+        for name, keys, error in ensure_indexes():
+            print(f"FAILED {name} {keys}: {error}")
+        print("Indexes ensured.")
+    elif command == "check":
+        scans = check_query_plans()
+        for name, query, stages in scans:
+            print(f"COLLSCAN {name} {query}: {' <- '.join(stages)}")
+        print(f"{len(scans)} known queries use a collection scan.")
+        sys.exit(1 if scans else 0)
+    else:
+        print("usage: python indexes.py ensure|check")
@@ -1,21 +1,38 @@
+import re
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils import db
-from datetime import datetime
-
-def log_token_history(student_username, instructor_username, action, tokens_changed):
-    db["token_logs"].insert_one({
-        "student": student_username,
-        "instructor": instructor_username,
-        "action": action,
-        "tokens_changed": tokens_changed,
-        "timestamp": datetime.utcnow()
-    })
+from utils import db, read_collection
+from analytics_utils import student_summaries, skill_summaries, token_balances, score_timeline, build_timeline
+from results_utils import recent_attempts, attempt_details
+from token_utils import BUMP_VERSION, log_token_history, bulk_reset_tokens, bulk_add_tokens, set_tokens_for_filter
+
+
+STUDENT_FIELDS = {"username": 1, "name": 1, "tokens": 1, "exam_attempts": 1}
+
+
+def student_search_filter(search_query):
+    """Case-insensitive substring match on username or name, evaluated by MongoDB."""
+    if not search_query:
+        return {}
+    pattern = {"$regex": re.escape(search_query), "$options": "i"}
+    return {"$or": [{"username": pattern}, {"name": pattern}]}
+
+
+def bulk_result_message(result):
+    return (f"Updated {result['modified']} of {result['matched']} students and queued "
+            f"{result['logged']} log entries in {result['seconds'] * 1000:.0f} ms.")
+
+
+def attempt_label(attempt):
+    # Results saved before the migration may have no timestamp (or session_id) yet
+    when = f"{attempt['timestamp']:%Y-%m-%d %H:%M}" if attempt.get("timestamp") else "unknown date"
+    return (f"{when} | {attempt.get('skill', '?')} ({attempt.get('difficulty', '?')}) | "
+            f"{attempt.get('score', 0)}/{attempt.get('total', '?')}")
+
 
 def instructor_dashboard():
     access_col = db["access_students"]
-    results_col = db["results"]
 
     if "instructor_logged_in" not in st.session_state or not st.session_state.instructor_logged_in:
         st.title("👨‍🏫 Instructor Panel")
@@ -40,28 +57,29 @@ def instructor_dashboard():
     # --------------------- Token Management ---------------------
     with tab1:
         st.subheader("👥 Approved Students")
-        students = list(access_col.find({}))
-        if not students:
+        if not access_col.find_one({}, {"_id": 1}):
             st.info("No approved students found.")
             return
 
         search_query = st.text_input("Search student by name or username").lower()
-        filtered_students = [s for s in students if
-                             search_query in s.get("username", "").lower() or
-                             search_query in s.get("name", "").lower()]
+        filtered_students = list(access_col.find(student_search_filter(search_query), STUDENT_FIELDS))
 
+        filtered_usernames = [s["username"] for s in filtered_students]
         if st.button("🔁 Bulk Reset All Tokens to 10"):
-            for s in filtered_students:
-                username = s["username"]
-                access_col.update_one(
-                    {"username": username},
-                    {
-                        "$set": {"tokens": 10},
-                        "$inc": {"exam_attempts": 1}
-                    }
-                )
-                log_token_history(username, instructor_username, "Bulk Reset to 10", 10)
-            st.success("All filtered students reset to 10 tokens.")
+            result = bulk_reset_tokens(filtered_usernames, instructor_username)
+            st.toast(f"All filtered students reset to 10 tokens. {bulk_result_message(result)}")
+            st.rerun()
+
+        col1, col2, col3 = st.columns([1, 1, 1])
+        amount = col1.number_input("Tokens", min_value=-100, max_value=100, value=1, step=1)
+        if col2.button("➕ Add to Filtered"):
+            result = bulk_add_tokens(filtered_usernames, instructor_username, int(amount))
+            st.toast(f"Added {int(amount):+d} tokens. {bulk_result_message(result)}")
+            st.rerun()
+        if col3.button("🎯 Set Filtered to Value"):
+            result = set_tokens_for_filter(student_search_filter(search_query),
+                                           instructor_username, max(0, int(amount)))
+            st.toast(f"Set tokens to {max(0, int(amount))}. {bulk_result_message(result)}")
             st.rerun()
 
         for student in filtered_students:
@@ -75,13 +93,13 @@ def instructor_dashboard():
                 st.write(f"🧪 **Exam Attempts**: `{attempts}`")
                 col1, col2, col3 = st.columns([1, 1, 2])
                 if col1.button("➕", key=f"inc_{username}"):
-                    access_col.update_one({"username": username}, {"$inc": {"tokens": 1}})
+                    access_col.update_one({"username": username}, {"$inc": {"tokens": 1, **BUMP_VERSION}})
                     log_token_history(username, instructor_username, "Token Increment", 1)
                     st.success(f"{username}: +1 token")
                     st.rerun()
                 if col2.button("➖", key=f"dec_{username}"):
                     if tokens > 0:
-                        access_col.update_one({"username": username}, {"$inc": {"tokens": -1}})
+                        access_col.update_one({"username": username}, {"$inc": {"tokens": -1, **BUMP_VERSION}})
                         log_token_history(username, instructor_username, "Token Decrement", -1)
                         st.warning(f"{username}: -1 token")
                     else:
@@ -92,7 +110,7 @@ def instructor_dashboard():
                         {"username": username},
                         {
                             "$set": {"tokens": 10},
-                            "$inc": {"exam_attempts": 1}
+                            "$inc": {"exam_attempts": 1, **BUMP_VERSION}
                         }
                     )
                     log_token_history(username, instructor_username, "Reset to 10", 10)
@@ -102,7 +120,7 @@ def instructor_dashboard():
     # --------------------- Token Logs ---------------------
     with tab2:
         st.subheader("📄 Token Action Logs")
-        logs = list(db["token_logs"].find({"instructor": instructor_username}).sort("timestamp", -1).limit(50))
+        logs = list(read_collection("token_logs").find({"instructor": instructor_username}).sort("timestamp", -1).limit(50))
         if not logs:
             st.info("No logs found.")
         else:
@@ -116,47 +134,45 @@ def instructor_dashboard():
     with tab3:
         st.subheader("📈 Token Usage & Performance Analytics")
 
-        token_data = [{"username": s["username"], "tokens_left": s.get("tokens", 0)} for s in students]
-        token_df = pd.DataFrame(token_data)
+        token_df = pd.DataFrame(token_balances(), columns=["username", "tokens_left"])
         fig1 = px.bar(token_df, x="username", y="tokens_left", title="🎯 Tokens Left Per Student")
         st.plotly_chart(fig1, use_container_width=True)
 
-        result_docs = list(results_col.find({}))
-        if result_docs:
-            score_data = []
-            for r in result_docs:
-                score_data.append({
-                    "username": r.get("username", "unknown"),
-                    "score": r.get("score", 0),
-                    "timestamp": r.get("timestamp", datetime.utcnow()),
-                    "skill": r.get("skill", "Unknown Skill")
-                })
-
-            score_df = pd.DataFrame(score_data)
+        summaries = student_summaries()
+        if summaries:
+            col1, col2, col3 = st.columns([1, 1, 1])
+            window = col1.selectbox("Group scores by", ["day", "week", "month"], key="timeline_window")
+            mode = col2.radio("Timeline", ["Per student", "Cohort"], horizontal=True, key="timeline_mode")
+            top_n = col3.slider("Students shown", 1, 25, 10, key="timeline_top_n", disabled=mode == "Cohort")
+            timeline_students = st.multiselect("Students (all if empty)",
+                                               [s["username"] for s in summaries], key="timeline_students")
+            timeline = score_timeline(timeline_students, window, by_student=mode == "Per student")
+            score_df = pd.DataFrame(build_timeline(timeline, top_n=top_n),
+                                    columns=["username", "timestamp", "score", "attempts"])
             score_df["timestamp"] = pd.to_datetime(score_df["timestamp"])
 
-            fig2 = px.line(score_df, x="timestamp", y="score", color="username",
-                           title="📈 Assessment Scores Over Time")
+            fig2 = px.line(score_df, x="timestamp", y="score", color="username", markers=True,
+                           title=f"📈 Average Assessment Score per {window.title()}")
             st.plotly_chart(fig2, use_container_width=True)
 
             st.markdown("### 🌝 Student Ranking (by Average Score)")
-            summary_df = score_df.groupby("username").agg({
-                "score": ["count", "mean", "max"]
-            }).reset_index()
+            summary_df = pd.DataFrame(summaries)
+            summary_df["average"] = summary_df["score_sum"] / summary_df["count"]
+            summary_df = summary_df[["username", "count", "average", "max_score"]]
             summary_df.columns = ["Username", "Attempts", "Average Score", "Max Score"]
             summary_df = summary_df.sort_values(by="Average Score", ascending=False)
             st.dataframe(summary_df, use_container_width=True)
 
             st.markdown("### 🧐 Per-Student Skill Breakdown (Pie Chart)")
-            selected_student = st.selectbox("Select a student", score_df["username"].unique())
-            student_skill_df = score_df[score_df["username"] == selected_student]
-            skill_summary = student_skill_df.groupby("skill")["score"].mean().reset_index()
+            students_unique = summary_df["Username"].tolist()
+            selected_student = st.selectbox("Select a student", students_unique)
+            skill_summary = pd.DataFrame(skill_summaries([selected_student]))
+            skill_summary["score"] = skill_summary["score_sum"] / skill_summary["count"]
             fig3 = px.pie(skill_summary, names="skill", values="score",
                           title=f"🎯 {selected_student} - Average Score Per Skill")
             st.plotly_chart(fig3, use_container_width=True)
 
             st.markdown("### ⚔️ Compare Two Students' Performance")
-            students_unique = score_df["username"].unique().tolist()
             col1, col2 = st.columns(2)
             with col1:
                 student1 = st.selectbox("Select Student 1", students_unique, key="student1")
@@ -164,10 +180,27 @@ def instructor_dashboard():
                 remaining_students = [s for s in students_unique if s != student1]
                 student2 = st.selectbox("Select Student 2", remaining_students, key="student2")
 
-            comp_df = score_df[score_df["username"].isin([student1, student2])]
+            comp_df = pd.DataFrame(skill_summaries([student1, student2]))
+            comp_df["score"] = comp_df["score_sum"] / comp_df["count"]
             fig4 = px.bar(comp_df, x="skill", y="score", color="username", barmode="group",
                           title=f"🔍 Comparison: {student1} vs {student2} - Skill Scores")
             st.plotly_chart(fig4, use_container_width=True)
+
+            st.markdown("### 🔎 Attempt Details")
+            detail_student = st.selectbox("Student", students_unique, key="detail_student")
+            attempts = recent_attempts(detail_student)
+            if attempts:
+                attempt = st.selectbox(
+                    "Attempt", attempts, key="detail_attempt",
+                    format_func=attempt_label,
+                )
+                if attempt.get("duration_seconds") is not None:
+                    st.caption(f"⏱️ Took {attempt['duration_seconds'] // 60} min {attempt['duration_seconds'] % 60} s")
+                if st.toggle("Show answers", key="detail_answers"):
+                    rows = attempt.get("responses") or attempt_details(attempt.get("session_id"))
+                    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+            else:
+                st.info("No attempts recorded for this student.")
         else:
             st.info("No assessment results found in the database.")
 
@@ -0,0 +1,144 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from utils import db
+
+# Audit and usage log entries are queued and written in batches by one background thread,
+# so a click never waits for its log write. When the queue is full, write() waits up to
+# LOG_ENQUEUE_TIMEOUT seconds for room and then drops the entry (counted in metrics).
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 500))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
+LOG_ENQUEUE_TIMEOUT = float(os.getenv("LOG_ENQUEUE_TIMEOUT", 0.05))
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Write-behind queue for log collections: entries are grouped per collection and written
+    with unordered insert_many once LOG_BATCH_SIZE are pending or LOG_FLUSH_INTERVAL seconds
+    after the first of them was queued.
+    """
+
+    def __init__(self, database=db, max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, enqueue_timeout=LOG_ENQUEUE_TIMEOUT):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._metrics = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0,
+                         "max_depth": 0, "last_error": None}
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._metrics[name] += value
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, collection, entry):
+        """Queues one entry for `collection`. Returns False if it was dropped."""
+        if self._thread is None:
+            self._start()
+        if self._closed:
+            self._count(dropped=1)
+            return False
+        try:
+            self._queue.put((collection, entry), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+        with self._lock:
+            self._metrics["enqueued"] += 1
+            self._metrics["max_depth"] = max(self._metrics["max_depth"], self._queue.qsize())
+        return True
+
+    def write_many(self, collection, entries):
+        """Queues several entries for `collection` and returns how many were accepted."""
+        return sum(self.write(collection, entry) for entry in entries)
+
+    def _next_batch(self):
+        """Blocks for the first entry, then collects more until the batch is full or due."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _insert(self, batch):
+        by_collection = defaultdict(list)
+        for collection, entry in batch:
+            by_collection[collection].append(entry)
+        for collection, entries in by_collection.items():
+            try:
+                self.database[collection].insert_many(entries, ordered=False)
+                self._count(written=len(entries), batches=1)
+            except BulkWriteError as e:
+                written = e.details.get("nInserted", 0)
+                self._count(written=written, failed=len(entries) - written, batches=1)
+                self._set_error(e)
+            except PyMongoError as e:
+                self._count(failed=len(entries))
+                self._set_error(e)
+
+    def _set_error(self, error):
+        with self._lock:
+            self._metrics["last_error"] = f"{type(error).__name__}: {error}"
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._insert(batch)
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every entry queued so far has been written (or has failed)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout=10):
+        """Writes out whatever is queued and stops the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def metrics(self):
+        """Returns the counters plus the current queue depth."""
+        with self._lock:
+            return {**self._metrics, "pending": self._queue.qsize()}
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.close)
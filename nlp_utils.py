@@ -0,0 +1,83 @@
+import threading
+from collections import Counter
+
+import spacy
+from spacy.matcher import PhraseMatcher
+from spacy.util import filter_spans
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Skill matching only needs the tokenizer, so every trained component is skipped
+UNUSED_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+# Canonical skill -> phrases that count as a mention. Canonical names are also the
+# question collection names in db_utils, so keep them in sync with the question banks.
+SKILL_VOCABULARY = {
+    "python": ["python", "python3"],
+    "sql": ["sql", "postgres", "postgresql", "mysql", "sqlite", "t-sql", "pl/sql"],
+    "java": ["java", "java se", "java ee"],
+    "javascript": ["javascript", "js", "ecmascript", "es6"],
+    "html": ["html", "html5"],
+    "css": ["css", "css3"],
+    "c++": ["c++", "cpp", "c plus plus"],
+    "mongodb": ["mongodb", "mongo", "mongo db"],
+}
+
+_nlp = None
+_skill_matcher = None
+_lock = threading.RLock()
+
+
+def _load():
+    try:
+        return spacy.load(SPACY_MODEL, exclude=UNUSED_PIPES)
+    except OSError:
+        # Model package not installed: the blank English pipeline has the same tokenizer
+        return spacy.blank("en")
+
+
+def get_nlp():
+    """
+    Returns the process-wide spaCy pipeline, loading it on first use.
+    Streamlit reruns never reload it.
+    """
+    global _nlp
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                _nlp = _load()
+    return _nlp
+
+
+class SkillMatcher:
+    """
+    Finds skill mentions with a spaCy PhraseMatcher run on tokenizer output only.
+    Matching is case-insensitive, covers multi-token aliases and counts hits per skill;
+    where matches overlap ("Java EE" also contains "Java") only the longest one counts.
+    """
+
+    def __init__(self, nlp, vocabulary=None):
+        self.nlp = nlp
+        self.vocabulary = vocabulary or SKILL_VOCABULARY
+        self.matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        for skill, aliases in self.vocabulary.items():
+            self.matcher.add(skill, [nlp.make_doc(alias) for alias in aliases])
+
+    def count_skills(self, text):
+        """Returns a Counter of canonical skill -> number of mentions in text."""
+        spans = filter_spans(self.matcher(self.nlp.make_doc(text), as_spans=True))
+        return Counter(span.label_ for span in spans)
+
+    def extract_skills(self, text):
+        """Returns the skills mentioned in text, most mentioned first."""
+        return [skill for skill, _ in self.count_skills(text).most_common()]
+
+
+def get_skill_matcher():
+    """Returns the process-wide SkillMatcher built on the shared pipeline."""
+    global _skill_matcher
+    if _skill_matcher is None:
+        with _lock:
+            if _skill_matcher is None:
+                _skill_matcher = SkillMatcher(get_nlp())
+    return _skill_matcher
@@ -0,0 +1,59 @@
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class JobCache:
+    """
+    The bookkeeping the worker pools share: the future of every pending job by key, so
+    identical submissions share one job, and an LRU of finished results. Not thread-safe;
+    a pool calls it with its own lock held.
+    """
+
+    def __init__(self, cache_size):
+        self.cache_size = cache_size
+        self._pending = {}  # key -> future, queued or running
+        self._results = OrderedDict()  # key -> result
+
+    def get(self, key):
+        """The future of the pending job for key, a done future for a cached result, or None."""
+        if key in self._pending:
+            return self._pending[key]
+        if key in self._results:
+            self._results.move_to_end(key)
+            future = Future()
+            future.set_result(self._results[key])
+            return future
+        return None
+
+    def start(self, key, future):
+        self._pending[key] = future
+
+    def pop(self, key):
+        """Forgets the pending job for key and returns its future, or None."""
+        return self._pending.pop(key, None)
+
+    def finish(self, key, future, ok, result=None):
+        """Records the outcome of future's job; only successful results are cached."""
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        if ok:
+            self._results[key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+
+def process_singleton(factory):
+    """Decorates a zero-argument factory so it runs once per process, on first call."""
+    instance = []
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return get
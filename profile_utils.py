@@ -0,0 +1,49 @@
+import os
+import time
+
+from utils import db
+
+# Fields the student dashboard reads from access_students; everything else stays in the database
+PROFILE_FIELDS = {"_id": 0, "username": 1, "name": 1, "email": 1, "phone": 1, "tokens": 1, "profile_version": 1}
+# How often (seconds) a cached profile is checked against the stored profile_version
+PROFILE_CHECK_INTERVAL = float(os.getenv("PROFILE_CHECK_INTERVAL", 10))
+
+
+class StudentProfile:
+    """
+    The logged-in student's profile, kept in st.session_state so reruns do not refetch it.
+    Writes that change a student's profile from elsewhere (instructor token changes) bump
+    `profile_version`; the cached copy compares it at most every PROFILE_CHECK_INTERVAL
+    seconds and reloads only when it changed. The session's own writes update the copy
+    directly through apply().
+    """
+
+    def __init__(self, username, collection=db["access_students"]):
+        self.username = username
+        self.collection = collection
+        self._doc = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        self._doc = self.collection.find_one({"username": self.username}, PROFILE_FIELDS)
+        self._checked_at = time.monotonic()
+
+    def get(self):
+        """Returns the cached profile, or None if the student no longer exists."""
+        if self._doc is None:
+            self._load()
+        elif time.monotonic() - self._checked_at >= PROFILE_CHECK_INTERVAL:
+            stored = self.collection.find_one({"username": self.username}, {"_id": 0, "profile_version": 1})
+            if stored is None or stored.get("profile_version", 0) != self._doc.get("profile_version", 0):
+                self._load()
+            else:
+                self._checked_at = time.monotonic()
+        return self._doc
+
+    def apply(self, fields):
+        """Merges fields returned by one of our own writes into the cached copy."""
+        if self._doc is not None:
+            self._doc.update(fields)
+
+    def invalidate(self):
+        self._doc = None
@@ -0,0 +1,126 @@
+import sys
+
+from pymongo import UpdateOne
+
+from db_utils import get_questions_by_id
+from utils import db, read_collection
+
+# `results` holds one slim summary per attempt (what analytics reads); the per-question
+# answers live in RESULT_RESPONSES, keyed by the same session_id, and are only read on drill-down
+RESULT_RESPONSES = "result_responses"
+MIGRATION_BATCH_SIZE = 500
+
+
+def save_result(summary, answers):
+    """
+    Saves an attempt idempotently: the answers first, then the summary, both upserted on
+    session_id. Returns True if this call created the summary, so the caller counts the
+    attempt exactly once.
+    """
+    db[RESULT_RESPONSES].update_one(
+        {"session_id": summary["session_id"]},
+        {"$setOnInsert": {"session_id": summary["session_id"], "username": summary["username"],
+                          "skill": summary["skill"], "difficulty": summary["difficulty"], "answers": answers}},
+        upsert=True,
+    )
+    saved = db["results"].update_one({"session_id": summary["session_id"]}, {"$setOnInsert": summary}, upsert=True)
+    return saved.upserted_id is not None
+
+
+def recent_attempts(username, limit=20):
+    """Returns the student's latest result summaries, newest first."""
+    return list(read_collection("results").find(
+        {"username": username}, {"_id": 0}, sort=[("timestamp", -1)], limit=limit
+    ))
+
+
+def attempt_details(session_id):
+    """
+    Returns one row per question of an attempt: question, type, selected, correct answer and
+    whether it was answered correctly. Attempts migrated from the old schema carry their
+    texts; new ones are resolved from the question bank.
+    """
+    detail = db[RESULT_RESPONSES].find_one({"session_id": session_id}, {"_id": 0}) if session_id else None
+    if not detail:
+        return []
+    if "responses" in detail:  # migrated from the old embedded schema
+        return detail["responses"]
+
+    answers = detail.get("answers", [])
+    questions = get_questions_by_id(detail["skill"], detail["difficulty"],
+                                    [(a["type"], a["question_id"]) for a in answers])
+    rows = []
+    for answer in answers:
+        question = questions.get(answer["question_id"], {})
+        options = question.get("options") or []
+        if answer.get("choice", len(options)) < len(options):
+            selected = options[answer["choice"]]
+        else:
+            selected = answer.get("text", "")
+        rows.append({
+            "question": question.get("question", "(question deleted)"),
+            "type": answer["type"],
+            "selected": selected,
+            "correct": question.get("answer"),
+            "is_correct": answer["correct"],
+            "tests": f"{answer['tests_passed']}/{answer['tests_total']}" if "tests_total" in answer else "",
+        })
+    return rows
+
+
+def dedupe_results():
+    """
+    Deletes the extra summaries the old submit page left by inserting on every rerun,
+    keeping the first result of each session_id, so the unique session_id index can build.
+    Returns the number of results deleted.
+    """
+    duplicates = db["results"].aggregate([
+        {"$match": {"session_id": {"$type": "string"}}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$session_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    deleted = 0
+    for group in duplicates:
+        deleted += db["results"].delete_many({"_id": {"$in": group["ids"][1:]}}).deleted_count
+    return deleted
+
+
+def migrate_results(batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Drops duplicate summaries (see dedupe_results), then moves the embedded `responses` of
+    old results into RESULT_RESPONSES and slims the summaries, giving them a session_id and
+    a timestamp (the ObjectId time) if they lack one. Safe to re-run after an interruption.
+    Returns (results migrated, duplicates deleted).
+    """
+    deleted = dedupe_results()
+    migrated = 0
+    while True:
+        batch = list(db["results"].find({"responses": {"$exists": True}}, limit=batch_size))
+        if not batch:
+            return migrated, deleted
+        db[RESULT_RESPONSES].bulk_write([
+            UpdateOne(
+                {"session_id": result.get("session_id") or str(result["_id"])},
+                {"$setOnInsert": {"username": result.get("username"), "skill": result.get("skill"),
+                                  "difficulty": result.get("difficulty"), "responses": result["responses"]}},
+                upsert=True,
+            )
+            for result in batch
+        ], ordered=False)
+        db["results"].update_many({"_id": {"$in": [r["_id"] for r in batch]}}, [
+            {"$set": {
+                "session_id": {"$ifNull": ["$session_id", {"$toString": "$_id"}]},
+                "timestamp": {"$ifNull": ["$timestamp", {"$toDate": "$_id"}]},
+            }},
+            {"$unset": "responses"},
+        ])
+        migrated += len(batch)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrated, deleted = migrate_results()
+        print(f"{deleted} duplicate results deleted, {migrated} results migrated to {RESULT_RESPONSES}.")
+    else:
+        print("usage: python results_utils.py migrate")
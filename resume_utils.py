@@ -0,0 +1,61 @@
+import hashlib
+import io
+from itertools import islice
+
+import docx
+import PyPDF2
+
+from nlp_utils import get_skill_matcher
+
+# Upload limits: oversized files are rejected, longer documents are truncated
+MAX_RESUME_BYTES = 5 * 1024 * 1024
+MAX_RESUME_PAGES = 20
+MAX_RESUME_CHARS = 200_000
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TEXT_TYPE = "text/plain"
+
+
+class ResumeTooLargeError(ValueError):
+    pass
+
+
+def iter_resume_text(data, mime_type, max_pages=MAX_RESUME_PAGES):
+    """Yields the text of a resume one page (PDF), paragraph (docx) or file (txt) at a time."""
+    if mime_type == TEXT_TYPE:
+        yield data.decode("utf-8", errors="replace")
+    elif mime_type == PDF_TYPE:
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        for page in islice(reader.pages, max_pages):
+            yield (page.extract_text() or "") + "\n"
+    elif mime_type == DOCX_TYPE:
+        for para in docx.Document(io.BytesIO(data)).paragraphs:
+            yield para.text + "\n"
+
+
+def extract_text_from_resume(data, mime_type, max_pages=MAX_RESUME_PAGES, max_chars=MAX_RESUME_CHARS):
+    """
+    Joins the streamed resume text once, stopping after max_pages pages or max_chars characters.
+    Raises ResumeTooLargeError for uploads over MAX_RESUME_BYTES.
+    """
+    if len(data) > MAX_RESUME_BYTES:
+        raise ResumeTooLargeError(f"Resume is larger than {MAX_RESUME_BYTES // (1024 * 1024)} MB.")
+
+    chunks, size = [], 0
+    for chunk in iter_resume_text(data, mime_type, max_pages):
+        chunks.append(chunk[:max_chars - size])
+        size += len(chunks[-1])
+        if size >= max_chars:
+            break
+    return "".join(chunks)
+
+
+def resume_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def analyze_resume(data, mime_type):
+    """Returns (text, skill counts) for a resume. Runs in the worker_pool processes."""
+    text = extract_text_from_resume(data, mime_type)
+    return text, get_skill_matcher().count_skills(text)
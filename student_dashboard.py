@@ -2,33 +2,32 @@ import streamlit as st
 from utils import db
 from bson import ObjectId
 import uuid
-import random
-import spacy
-import PyPDF2
-import docx
-from db_utils import get_all_questions
+import time
+from db_utils import get_all_questions, DEFAULT_QUOTAS
+from resume_utils import MAX_RESUME_BYTES, resume_digest
+from worker_pool import get_resume_pool
+from analytics_utils import record_result
+from token_utils import debit_token, log_token_usage
+from profile_utils import StudentProfile
+from exam_session import ExamSession
+from results_utils import save_result
+from course_utils import CourseLoader
 from datetime import datetime
 
 def student_dashboard():
-    access_col = db["access_students"]
-    course_col = db["courses"]
-    content_col = db["course_content"]
     enrollments_col = db["enrollments"]
     purchases_col = db["purchases"]
-    usage_log_col = db["token_usage_logs"]
 
     username = st.session_state.get("student_username")
-    user = access_col.find_one({"username": username})
+    profile = st.session_state.get("student_profile")
+    if profile is None or profile.username != username:
+        profile = st.session_state.student_profile = StudentProfile(username)
+    user = profile.get()
 
     if not user:
         st.error("User not found. Please login again.")
         st.stop()
 
-    # Initialize token field if missing
-    if "tokens" not in user:
-        access_col.update_one({"username": username}, {"$set": {"tokens": 10}})
-        user["tokens"] = 10
-
     st.sidebar.title("📚 Student Panel")
     menu = st.sidebar.radio("Menu", ["Home", "Courses", "My Courses", "AI Modules", "Settings"])
 
@@ -46,26 +45,27 @@ def student_dashboard():
 
     elif menu == "Courses":
         st.subheader("📘 Browse Available Courses")
-        courses = list(course_col.find({}))
-        for course in courses:
+        for course, enrollment in CourseLoader(username).catalog():
             with st.expander(f"{course['title']} by {course['instructor']}"):
                 st.write(course.get("description", "No description provided."))
                 is_paid = course.get("price", 0) > 0
-                enrollment = enrollments_col.find_one({"username": username, "course_id": course["_id"]})
 
                 if not enrollment:
                     if is_paid:
                         st.button("Coming Soon (Paid)", key=f"coming_soon_{course['_id']}", disabled=True)
                     else:
                         if st.button("Enroll (Free)", key=f"enroll_{course['_id']}"):
-                            enrollments_col.insert_one({
-                                "username": username,
-                                "course_id": course["_id"],
-                                "course_title": course["title"],
-                                "instructor": course["instructor"],
-                                "status": "approved",
-                                "enrolled_on": datetime.now()
-                            })
+                            # Upsert so a double click cannot trip the unique (username, course_id) index
+                            enrollments_col.update_one(
+                                {"username": username, "course_id": course["_id"]},
+                                {"$setOnInsert": {
+                                    "course_title": course["title"],
+                                    "instructor": course["instructor"],
+                                    "status": "approved",
+                                    "enrolled_on": datetime.now()
+                                }},
+                                upsert=True
+                            )
                             st.success("✅ Enrolled in free course.")
                             st.rerun()
                 else:
@@ -78,23 +78,18 @@ def student_dashboard():
 
     elif menu == "My Courses":
         st.subheader("📂 My Enrolled Courses")
-        enrollments = list(enrollments_col.find({"username": username, "status": "approved"}))
-        if not enrollments:
+        my_courses = CourseLoader(username).my_courses()
+        if not my_courses:
             st.info("You haven't enrolled in any courses yet.")
         else:
-            for enrollment in enrollments:
-                course = course_col.find_one({"_id": enrollment["course_id"]})
-                if not course:
-                    continue
+            for enrollment, course, contents in my_courses:
                 with st.expander(f"{course['title']} by {course['instructor']}"):
                     st.write(f"📅 Enrolled on: {enrollment.get('enrolled_on', 'N/A')}")
-                    contents = list(content_col.find({"course_id": course["_id"]}))
-                    for content in contents:
+                    for content, purchased in contents:
                         if content["access"] == "free":
                             st.write(f"📄 {content['title']} (Free)")
                             st.markdown(f"[Download]({content['file_url']})")
                         else:
-                            purchased = purchases_col.find_one({"username": username, "content_id": content["_id"]})
                             if purchased:
                                 st.write(f"🔐 {content['title']} (Paid) ✅ Purchased")
                                 st.markdown(f"[Download]({content['file_url']})")
@@ -106,57 +101,60 @@ def student_dashboard():
                                     st.rerun()
 
     elif menu == "AI Modules":
-        nlp = spacy.load("en_core_web_sm")
-        ALL_SKILLS = ["python", "sql", "java", "javascript", "html", "css", "c++", "mongodb"]
-
         for key, default in {
             "page": "upload",
             "selected_skill": None,
             "difficulty": None,
-            "questions": [],
+            "exam": None,
             "index": 0,
             "score": 0,
-            "responses": [],
             "session_id": str(uuid.uuid4()),
         }.items():
             if key not in st.session_state:
                 st.session_state[key] = default
 
-        def extract_text_from_resume(uploaded_file):
-            text = ""
-            if uploaded_file.type == "text/plain":
-                text = uploaded_file.read().decode("utf-8")
-            elif uploaded_file.type == "application/pdf":
-                reader = PyPDF2.PdfReader(uploaded_file)
-                for page in reader.pages:
-                    text += page.extract_text()
-            elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                doc = docx.Document(uploaded_file)
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-            return text
-
-        def extract_skills(text):
-            doc = nlp(text.lower())
-            return list({token.text for token in doc if token.text in ALL_SKILLS})
-
         if st.session_state.page == "upload":
             st.subheader("📄 Resume Skill Extractor & Assessment")
             uploaded_file = st.file_uploader("Upload your resume", type=["pdf", "txt", "docx"])
-            if uploaded_file:
-                text = extract_text_from_resume(uploaded_file)
-                extracted_skills = extract_skills(text)
+            if uploaded_file and uploaded_file.size > MAX_RESUME_BYTES:
+                # Refused before reading, hashing or sending it to a worker: Streamlit itself
+                # accepts uploads up to 200 MB
+                st.error(f"❌ Resume is larger than {MAX_RESUME_BYTES // (1024 * 1024)} MB.")
+            elif uploaded_file:
+                data = uploaded_file.getvalue()
+                digest = resume_digest(data)
+                pool = get_resume_pool()
+                future = pool.submit(digest, uploaded_file.type, data)
+
+                # Poll the worker so a slow PDF only delays this page, and can be cancelled. The
+                # pool enforces the timeout itself and refuses files that timed out or were cancelled.
+                if not future.done():
+                    cancel = st.button("✖ Cancel analysis")
+                    progress = st.progress(0.0, text="🔍 Analyzing resume...")
+                    while not cancel and not future.done():
+                        progress.progress(min(pool.elapsed(digest) / pool.timeout, 1.0), text="🔍 Analyzing resume...")
+                        time.sleep(0.1)
+                    progress.empty()
+                    if cancel:
+                        pool.cancel(digest)
+
+                skill_counts = None
+                if future.done():
+                    if future.exception():
+                        st.error(f"❌ {future.exception()}")
+                    else:
+                        _, skill_counts = future.result()
 
-                if extracted_skills:
+                if skill_counts:
                     st.success("Skills found in resume:")
-                    for skill in extracted_skills:
+                    for skill, hits in skill_counts.most_common():
                         col1, col2 = st.columns([3, 1])
-                        col1.write(skill.title())
+                        col1.write(f"{skill.title()} ({hits} mentions)")
                         if col2.button(f"Take Assessment: {skill}", key=skill):
                             st.session_state.selected_skill = skill
                             st.session_state.page = "assessment"
                             st.rerun()
-                else:
+                elif skill_counts is not None:
                     st.warning("No predefined skills found in your resume.")
 
         elif st.session_state.page == "assessment":
@@ -166,103 +164,98 @@ def student_dashboard():
             if st.session_state.difficulty is None:
                 difficulty = st.radio("Choose difficulty level:", ["easy", "medium", "hard"], key=f"q_{st.session_state.index}")
                 if st.button("Start Assessment"):
-                    if user["tokens"] <= 0:
-                        st.error("❌ You have no tokens left. Please contact admin.")
-                        return
-
+                    # No pre-check on the cached balance: it may predate an instructor top-up
                     all_questions = get_all_questions(skill, difficulty)
-                    if len(all_questions) < 15:
+                    if len(all_questions) < sum(DEFAULT_QUOTAS.values()):
                         st.error("Insufficient questions for this skill and difficulty level.")
                         st.session_state.page = "upload"
                         st.rerun()
 
-                    # Deduct token
-                    access_col.update_one({"username": username}, {"$inc": {"tokens": -1}})
-                    usage_log_col.insert_one({
-                        "username": username,
-                        "module": "AI Assessment",
-                        "skill": skill,
-                        "difficulty": difficulty,
-                        "used_on": datetime.utcnow()
-                    })
-                    user["tokens"] -= 1  # reflect change locally for current session
+                    # Deduct token; the debit itself decides whether the student has one left
+                    debited = debit_token(username)
+                    if debited is None:
+                        profile.invalidate()
+                        st.error("❌ You have no tokens left. Please contact admin.")
+                        return
+                    log_token_usage(username, "AI Assessment", skill=skill, difficulty=difficulty)
+                    profile.apply(debited)  # reflect change locally for current session
 
-                    st.session_state.questions = random.sample(all_questions, 15)
-                    random.shuffle(st.session_state.questions)
+                    # Only ids and answers live in the session; question texts and answer keys stay in the cache
+                    st.session_state.exam = ExamSession(skill, difficulty, all_questions)  # already sampled and shuffled
                     st.session_state.index = 0
                     st.session_state.score = 0
-                    st.session_state.responses = []
                     st.session_state.difficulty = difficulty
                     st.session_state.page = "exam"
                     st.rerun()
 
-        elif st.session_state.page == "exam" and st.session_state.index < len(st.session_state.questions):
-            question = st.session_state.questions[st.session_state.index]
+        elif st.session_state.page == "exam" and st.session_state.index < len(st.session_state.exam):
+            exam = st.session_state.exam
+            question = exam.question(st.session_state.index)
             q_num = st.session_state.index + 1
-            st.markdown(f"*Question {q_num}:* {question['question']}")
-
-            if question["type"] == "coding":
-                for key in ["constraints", "input", "output", "explanation"]:
-                    if key in question:
-                        st.markdown(f"**{key.title()}**: {question[key]}")
-
-            if question["type"] in ["mcqs", "blanks"] and "options" in question:
-                answer = st.radio("Options:", question["options"], index=None, key=f"q_{st.session_state.index}")
+            if question is None:
+                # Deleted from the bank since the exam started; grading counts it as unanswered
+                st.markdown(f"*Question {q_num}:* (question no longer available)")
+                st.info("This question was removed by the instructor. Move on to the next one.")
             else:
-                answer = st.text_area("Your answer:", key=f"q_{st.session_state.index}")
+                st.markdown(f"*Question {q_num}:* {question['question']}")
 
-            if len(st.session_state.responses) <= st.session_state.index:
-                st.session_state.responses.append({"selected": ""})
+                if question["type"] == "coding":
+                    for key in ["constraints", "input", "output", "explanation"]:
+                        if key in question:
+                            st.markdown(f"**{key.title()}**: {question[key]}")
 
-            st.session_state.responses[st.session_state.index].update({
-                "question": question["question"],
-                "type": question["type"],
-                "selected": answer,
-                "correct": question.get("answer")
-            })
+                if question["type"] in ["mcqs", "blanks"] and "options" in question:
+                    answer = st.radio("Options:", question["options"], index=exam.choice(st.session_state.index),
+                                      key=f"q_{st.session_state.index}")
+                else:
+                    answer = st.text_area("Your answer:", value=exam.text(st.session_state.index),
+                                          key=f"q_{st.session_state.index}")
+                exam.record(st.session_state.index, question, answer)
 
             col1, col2, col3 = st.columns([1, 1, 2])
             if col1.button("⬅ Previous", disabled=st.session_state.index == 0):
                 st.session_state.index -= 1
                 st.rerun()
 
-            if col2.button("➡ Next", disabled=st.session_state.index == len(st.session_state.questions) - 1):
+            if col2.button("➡ Next", disabled=st.session_state.index == len(exam) - 1):
                 st.session_state.index += 1
                 st.rerun()
 
-            if st.session_state.index == len(st.session_state.questions) - 1:
+            if st.session_state.index == len(exam) - 1:
                 if col3.button("✅ Submit"):
                     st.session_state.page = "submit"
                     st.rerun()
 
         elif st.session_state.page == "submit":
-            score = 0
-            for resp in st.session_state.responses:
-                selected = resp.get("selected")
-                correct = resp.get("correct")
-                if isinstance(selected, str) and isinstance(correct, str):
-                    if selected.strip().lower() == correct.strip().lower():
-                        score += 1
-
+            exam = st.session_state.exam
+            with st.spinner("⚙️ Running your code against the test cases..."):
+                score, answers = exam.grade()
             st.session_state.score = score
+            if "submitted_at" not in st.session_state:
+                st.session_state.submitted_at = datetime.utcnow()
 
-            db["results"].insert_one({
+            result = {
                 "session_id": st.session_state.session_id,
                 "username": username,
                 "skill": st.session_state.selected_skill,
                 "difficulty": st.session_state.difficulty,
                 "score": st.session_state.score,
-                "total": len(st.session_state.questions),
-                "responses": st.session_state.responses
-            })
+                "total": len(exam),
+                "timestamp": st.session_state.submitted_at,
+                "duration_seconds": round((st.session_state.submitted_at - exam.started_at).total_seconds()),
+            }
+            # Saved by session_id: reruns of this page must not save or count the result twice
+            if save_result(result, answers):
+                record_result(result)
 
             st.subheader("🎉 Assessment Completed!")
-            st.success(f"✅ Score: {st.session_state.score} / {len(st.session_state.questions)}")
+            st.success(f"✅ Score: {st.session_state.score} / {len(exam)}")
             st.balloons()
 
             if st.button("Back to Home"):
-                for key in ["page", "selected_skill", "difficulty", "questions", "index", "score", "responses"]:
+                for key in ["page", "selected_skill", "difficulty", "exam", "index", "score"]:
                     st.session_state[key] = None
+                st.session_state.pop("submitted_at", None)
                 st.session_state.session_id = str(uuid.uuid4())
                 st.session_state.page = "upload"
                 st.rerun()
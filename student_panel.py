@@ -1,6 +1,8 @@
 import streamlit as st
 from utils import db
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from token_utils import DEFAULT_TOKENS
 
 # MongoDB collections
 reg_col = db["student_registrations"]
@@ -46,16 +48,21 @@ def student_register():
         elif reg_col.find_one({"username": username}):
             st.error("❌ Username already taken.")
         else:
-            reg_col.insert_one({
-                "name": name,
-                "email": email,
-                "phone": phone,
-                "username": username,
-                "password": password,
-                "role": role
-            })
-            st.success("✅ Registration successful! Await admin approval.")
-            st.balloons()
+            try:
+                reg_col.insert_one({
+                    "name": name,
+                    "email": email,
+                    "phone": phone,
+                    "username": username,
+                    "password": password,
+                    "role": role,
+                    "tokens": DEFAULT_TOKENS
+                })
+            except DuplicateKeyError:
+                st.error("❌ Username or email already registered.")
+            else:
+                st.success("✅ Registration successful! Await admin approval.")
+                st.balloons()
 
 
 def student_forgot_password():
@@ -0,0 +1,96 @@
+import time
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from log_writer import log_writer
+from utils import db
+
+DEFAULT_TOKENS = 10
+# Every token write bumps the student's profile_version so cached profiles reload (profile_utils)
+BUMP_VERSION = {"profile_version": 1}
+
+
+def debit_token(username, collection=db["access_students"]):
+    """
+    Takes one token from the student in a single conditional update, so concurrent starts
+    can never drive the balance below zero. Returns the updated tokens and profile_version,
+    or None if the student had no tokens left.
+    """
+    return collection.find_one_and_update(
+        {"username": username, "tokens": {"$gt": 0}},
+        {"$inc": {"tokens": -1, **BUMP_VERSION}},
+        projection={"_id": 0, "tokens": 1, "profile_version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def init_missing_tokens():
+    """Gives DEFAULT_TOKENS to approved students created before tokens were set on approval."""
+    return db["access_students"].update_many(
+        {"tokens": {"$exists": False}}, {"$set": {"tokens": DEFAULT_TOKENS}, "$inc": BUMP_VERSION}
+    ).modified_count
+
+
+def log_token_usage(username, module, **details):
+    """Queues a record of one token spent on `module`."""
+    log_writer.write("token_usage_logs", {"username": username, "module": module, **details, "used_on": datetime.utcnow()})
+
+
+def log_token_history(student_username, instructor_username, action, tokens_changed):
+    log_writer.write("token_logs", {
+        "student": student_username,
+        "instructor": instructor_username,
+        "action": action,
+        "tokens_changed": tokens_changed,
+        "timestamp": datetime.utcnow()
+    })
+
+
+def apply_token_update(usernames, instructor_username, action, update, tokens_changed):
+    """
+    Applies one update to every listed student with a single update_many and queues their
+    audit entries on the log writer. Returns counts and the elapsed seconds.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    start = time.perf_counter()
+    if not usernames:
+        return {"matched": 0, "modified": 0, "logged": 0, "seconds": 0.0}
+
+    result = db["access_students"].update_many({"username": {"$in": usernames}}, update)
+    now = datetime.utcnow()
+    logged = log_writer.write_many("token_logs", [{
+        "student": username,
+        "instructor": instructor_username,
+        "action": action,
+        "tokens_changed": tokens_changed,
+        "timestamp": now
+    } for username in usernames])
+    return {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "logged": logged,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def bulk_reset_tokens(usernames, instructor_username, tokens=DEFAULT_TOKENS):
+    """Sets every student's tokens to `tokens` and counts a new exam attempt, as the single reset does."""
+    update = {"$set": {"tokens": tokens}, "$inc": {"exam_attempts": 1, **BUMP_VERSION}}
+    return apply_token_update(usernames, instructor_username, f"Bulk Reset to {tokens}", update, tokens)
+
+
+def bulk_add_tokens(usernames, instructor_username, amount):
+    """Adds `amount` tokens (negative to remove) to every student, never going below zero."""
+    update = [{"$set": {
+        "tokens": {"$max": [0, {"$add": [{"$ifNull": ["$tokens", 0]}, amount]}]},
+        "profile_version": {"$add": [{"$ifNull": ["$profile_version", 0]}, 1]},
+    }}]
+    return apply_token_update(usernames, instructor_username, f"Bulk Add {amount:+d}", update, amount)
+
+
+def set_tokens_for_filter(query, instructor_username, tokens):
+    """Sets tokens to `tokens` for every approved student matching a MongoDB filter."""
+    usernames = [s["username"] for s in db["access_students"].find(query, {"username": 1})]
+    return apply_token_update(usernames, instructor_username, f"Bulk Set to {tokens}",
+                              {"$set": {"tokens": tokens}, "$inc": BUMP_VERSION}, tokens)
@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+from nlp_utils import get_skill_matcher
+from pool_utils import JobCache, process_singleton
+from resume_utils import analyze_resume
+
+RESUME_WORKERS = int(os.getenv("RESUME_WORKERS", min(2, os.cpu_count() or 1)))
+RESUME_TIMEOUT = float(os.getenv("RESUME_TIMEOUT", 30))
+RESUME_CACHE_SIZE = 256
+# Digests of uploads that timed out or were cancelled, refused until they fall out of this LRU
+RESUME_REJECTED_SIZE = 1024
+
+
+class ResumeRejectedError(Exception):
+    """The upload timed out or was cancelled before, so it is not analysed again."""
+
+
+def _worker_main(conn):
+    # Load spaCy and build the matcher before the first resume arrives
+    get_skill_matcher()
+    while True:
+        try:
+            data, mime_type = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, analyze_resume(data, mime_type)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name="resume-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None  # (digest, future, started_at) while busy
+        self.aborted = False  # set to have the dispatcher replace this worker
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+
+class ResumeWorkerPool:
+    """
+    Parses and analyses resumes in pre-warmed worker processes, off the Streamlit script thread.
+
+    Jobs are keyed by the upload's content digest: identical uploads share one job, and
+    finished results are kept in a small LRU so reruns and repeat uploads return at once.
+    A job that runs past `timeout` or is cancelled has its worker terminated and replaced,
+    so a pathological file cannot keep a worker busy, and its digest is refused from then on.
+    """
+
+    def __init__(self, workers=RESUME_WORKERS, timeout=RESUME_TIMEOUT, cache_size=RESUME_CACHE_SIZE):
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(self._context) for _ in range(workers)]
+        self._queue = deque()  # (digest, mime_type, data, future)
+        self._jobs = JobCache(cache_size)  # digest -> (text, skill counts)
+        self._rejected = OrderedDict()  # digest -> reason
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._dispatch, name="resume-dispatch", daemon=True).start()
+
+    def submit(self, digest, mime_type, data):
+        """
+        Returns a future for the (text, skill counts) of an upload, reusing cached or running
+        jobs. The future fails with ResumeRejectedError for uploads that timed out or were
+        cancelled before, and with TimeoutError if this job runs past the timeout.
+        """
+        with self._lock:
+            future = self._jobs.get(digest)
+            if future is not None:
+                return future
+            future = Future()
+            if digest in self._rejected:
+                future.set_exception(ResumeRejectedError(
+                    f"This file {self._rejected[digest]} earlier and will not be analysed again. "
+                    "Try a smaller or simpler file."))
+            else:
+                self._jobs.start(digest, future)
+                self._queue.append((digest, mime_type, data, future))
+                self._wakeup.set()
+        return future
+
+    def elapsed(self, digest):
+        """Seconds the job for digest has been running in a worker (0 if queued or none)."""
+        with self._lock:
+            for worker in self._workers:
+                if worker.job and worker.job[0] == digest:
+                    return time.monotonic() - worker.job[2]
+        return 0.0
+
+    def cancel(self, digest):
+        """Cancels the job for digest: a queued job is dropped, a running one has its worker replaced."""
+        self._abort(digest, "was cancelled", ResumeRejectedError("Resume analysis was cancelled."))
+
+    def _abort(self, digest, reason, error):
+        with self._lock:
+            future = self._jobs.pop(digest)
+            self._remember_rejected(digest, reason)
+            self._queue = deque(job for job in self._queue if job[0] != digest)
+            for worker in self._workers:
+                if worker.job and worker.job[0] == digest:
+                    worker.aborted = True
+            self._wakeup.set()
+        if future and not future.done():
+            future.set_exception(error)
+
+    def _remember_rejected(self, digest, reason):
+        self._rejected[digest] = reason
+        while len(self._rejected) > RESUME_REJECTED_SIZE:
+            self._rejected.popitem(last=False)
+
+    def _finish(self, worker, ok, value):
+        digest, future, _ = worker.job
+        worker.job = None
+        with self._lock:
+            self._jobs.finish(digest, future, ok, value)
+        if not future.done():
+            future.set_result(value) if ok else future.set_exception(value)
+
+    def _replace(self, worker):
+        # Only the dispatcher thread stops workers, so it never waits on a closed pipe
+        worker.stop()
+        self._workers[self._workers.index(worker)] = _Worker(self._context)
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                for worker in [w for w in self._workers if w.aborted or not w.process.is_alive()]:
+                    self._replace(worker)
+                idle = [w for w in self._workers if w.job is None]
+                while idle and self._queue:
+                    job = self._queue.popleft()
+                    worker = idle.pop()
+                    try:
+                        worker.conn.send((job[2], job[1]))
+                    except OSError:  # died since the check above; retry on another worker
+                        worker.aborted = True
+                        self._queue.appendleft(job)
+                        continue
+                    worker.job = (job[0], job[3], time.monotonic())
+                busy = [w for w in self._workers if w.job is not None]
+
+            for conn in wait([w.conn for w in busy], timeout=0.1) if busy else []:
+                worker = next(w for w in busy if w.conn is conn)
+                try:
+                    ok, value = conn.recv()
+                except (EOFError, OSError):
+                    ok, value = False, RuntimeError("The resume worker stopped unexpectedly.")
+                    worker.aborted = True
+                if not worker.aborted or not ok:
+                    self._finish(worker, ok, value)
+
+            for worker in busy:
+                job = worker.job
+                if job and not worker.aborted and time.monotonic() - job[2] > self.timeout:
+                    self._abort(job[0], "timed out", TimeoutError("Resume analysis timed out. Try a smaller file."))
+            if not busy:
+                self._wakeup.wait(0.5)
+                self._wakeup.clear()
+
+
+@process_singleton
+def get_resume_pool():
+    """Returns the process-wide resume worker pool, starting its workers on first use."""
+    return ResumeWorkerPool()